@@ -1,8 +1,54 @@
-import pygame
-from constants import PUYO_EMOJIS
-
-# Load these once
-nuisance_images = {
-    value: pygame.image.load(f"nuisance_images/{key}")
-    for value, key in PUYO_EMOJIS.items()
-}
\ No newline at end of file
+import os
+from constants import BASE_TILE_SIZE, PUYO_EMOJIS
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nuisance_images")
+
+# Loaded on first use so the rules modules never pull in pygame
+nuisance_images = {}
+# tile size -> (atlas Surface, value -> Rect in the atlas)
+nuisance_atlases = {}
+
+def load_nuisance_images():
+    """
+    Loads the nuisance icons once and returns the value -> Surface mapping.
+    Icons are converted to the display format when a window already exists.
+    """
+    if not nuisance_images:
+        import pygame
+
+        convert = pygame.display.get_surface() is not None
+        for value, key in PUYO_EMOJIS.items():
+            image = pygame.image.load(os.path.join(ASSET_DIR, key))
+            nuisance_images[value] = image.convert_alpha() if convert else image
+    return nuisance_images
+
+def nuisance_atlas(tile_size):
+    """
+    Returns one Surface holding every nuisance icon scaled for ``tile_size``
+    (icons keep their drawn size at BASE_TILE_SIZE), plus each icon's Rect in it.
+    """
+    atlas = nuisance_atlases.get(tile_size)
+    if atlas is None:
+        import pygame
+
+        scale = tile_size / BASE_TILE_SIZE
+        icons = {}
+        for value, image in load_nuisance_images().items():
+            if scale != 1:
+                width, height = image.get_size()
+                size = (max(round(width * scale), 1), max(round(height * scale), 1))
+                image = pygame.transform.smoothscale(image, size)
+            icons[value] = image
+        surface = pygame.Surface(
+            (sum(image.get_width() for image in icons.values()), max(image.get_height() for image in icons.values())),
+            pygame.SRCALPHA,
+        )
+        rects = {}
+        x = 0
+        for value, image in icons.items():
+            rects[value] = surface.blit(image, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)  # Copy alpha as is
+            x += image.get_width()
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        atlas = nuisance_atlases[tile_size] = (surface, rects)
+    return atlas
@@ -0,0 +1,260 @@
+import numpy as np
+from constants import *
+import scoring
+
+class BatchEngine:
+    """
+    Steps many independent boards in lockstep on NumPy arrays.
+
+    Boards are held as an (N, H, W) int8 array where 0 is empty and
+    ``COLORS.index(color) + 1`` is a puyo. ``pairs`` is (N, 1 + preview_depth, 2):
+    the current pair then the preview queue, as (pivot, satellite) color codes.
+    A move is a placement (pivot column, orientation) with the satellite
+    offset given by ``ROTATION_OFFSETS``. Scoring follows ``GameState``,
+    including ``required_group_number`` and crazy mode.
+    """
+
+    def __init__(
+        self,
+        num_boards,
+        grid_width=DEFAULT_GRID_WIDTH,
+        grid_height=DEFAULT_GRID_HEIGHT,
+        required_group_number=4,
+        crazy=False,
+        preview_depth=2,
+        seed=None,
+    ):
+        if preview_depth < 2:
+            raise ValueError("preview_depth must be at least 2 (next and next-next)")
+        self.num_boards = num_boards
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.required_group_number = required_group_number
+        self.crazy = crazy
+        self.preview_depth = preview_depth
+        self.rng = np.random.default_rng(seed)
+        self.spawn_column = (grid_width - 1) // 2
+
+        cells = grid_width * grid_height
+        self.offsets = np.array(ROTATION_OFFSETS, dtype=np.int64)
+        self.group_bonus_table = np.array(
+            [scoring.group_bonus(size) for size in range(cells + 1)], dtype=np.int64
+        )
+        self.color_bonus_table = np.array(
+            [scoring.color_bonus(count) for count in range(len(COLORS) + 1)], dtype=np.int64
+        )
+        self.chain_bonus_table = np.array(CHAIN_BONUS, dtype=np.int64)
+
+        self.grids = np.zeros((num_boards, grid_height, grid_width), dtype=np.int8)
+        self.pairs = np.zeros((num_boards, 1 + preview_depth, 2), dtype=np.int8)
+        self.scores = np.zeros(num_boards, dtype=np.int64)
+        self.chain_counts = np.zeros(num_boards, dtype=np.int64)
+        self.running = np.zeros(num_boards, dtype=bool)
+        self.reachable_heights = None
+        self.reachable_mask = None
+        self.reset()
+
+    def reset(self, mask=None):
+        """Clears the boards selected by ``mask`` (all by default) and deals new pairs."""
+        if mask is None:
+            mask = np.ones(self.num_boards, dtype=bool)
+        count = int(mask.sum())
+        self.grids[mask] = 0
+        self.pairs[mask] = self.random_pairs((count, 1 + self.preview_depth))
+        self.scores[mask] = 0
+        self.chain_counts[mask] = 0
+        self.running[mask] = True
+
+    def random_pairs(self, shape):
+        return self.rng.integers(1, len(COLORS) + 1, size=shape + (2,), dtype=np.int8)
+
+    def heights(self):
+        """Returns the (N, W) number of puyos in each column."""
+        return (self.grids != 0).sum(axis=1)
+
+    def reachable(self, heights):
+        """
+        Returns an (N, W, 4) mask of the placements the current pair can reach
+        from the spawn point with move, rotate and drop inputs, the same set as
+        ``GameState.legal_placements``. The pivot starts on row 0 with the
+        satellite below it and may drop to row 1, where the satellite has room
+        above it; a placement is reachable only if every column passed on the
+        way leaves those rows free. Sweeps outward from ``spawn_column`` over
+        (row, column, orientation) until nothing new is reached.
+        """
+        tops = self.grid_height - heights  # Free rows at the top of each column
+        # Laid out (orientation, row, N, W) so every shift below is a contiguous slice
+        fits = np.zeros((len(ROTATION_OFFSETS), 2, self.num_boards, self.grid_width), dtype=bool)
+        for row in range(2):
+            for orientation, (dx, dy) in enumerate(ROTATION_OFFSETS):
+                if row + dy < 0:
+                    continue
+                lo, hi = max(0, -dx), self.grid_width - max(0, dx)
+                fits[orientation, row, :, lo:hi] = (tops[:, lo:hi] > row) & (tops[:, lo + dx:hi + dx] > row + dy)
+        seen = np.zeros_like(fits)
+        seen[0, 0, :, self.spawn_column] = fits[0, 0, :, self.spawn_column]
+        grown = np.empty_like(seen)
+        while True:
+            np.copyto(grown, seen)
+            grown[..., 1:] |= seen[..., :-1]
+            grown[..., :-1] |= seen[..., 1:]
+            # Orientations are cyclic: rotate each way, wrapping at the ends
+            grown[1:] |= seen[:-1]
+            grown[0] |= seen[-1]
+            grown[:-1] |= seen[1:]
+            grown[-1] |= seen[0]
+            grown[:, 1] |= seen[:, 0]
+            grown &= fits
+            if np.array_equal(grown, seen):
+                return seen.any(axis=1).transpose(1, 2, 0)
+            seen, grown = grown, seen
+
+    def current_reachable(self):
+        """
+        ``reachable`` for the boards as they stand. Reachability depends only
+        on the column heights, so the mask is kept until they change and
+        ``legal_mask`` and ``step`` share one computation.
+        """
+        heights = self.heights()
+        if self.reachable_heights is None or not np.array_equal(heights, self.reachable_heights):
+            self.reachable_heights = heights
+            self.reachable_mask = self.reachable(heights)
+        return self.reachable_mask
+
+    def legal_mask(self):
+        """Returns an (N, W, 4) mask of the placements each running board can reach."""
+        return self.current_reachable() & self.running[:, None, None]
+
+    def step(self, columns, orientations):
+        """
+        Places the current pair of every running board, resolves all chains and
+        deals the next pair. Boards given an illegal placement are ended.
+        Returns (score_delta, chain_length) arrays of shape (N,).
+        """
+        columns = np.asarray(columns, dtype=np.int64)
+        orientations = np.asarray(orientations, dtype=np.int64)
+        boards = np.arange(self.num_boards)
+        dx = self.offsets[orientations, 0]
+        dy = self.offsets[orientations, 1]
+        satellite_columns = columns + dx
+
+        legal = (
+            self.running
+            & (columns >= 0)
+            & (columns < self.grid_width)
+            & (satellite_columns >= 0)
+            & (satellite_columns < self.grid_width)
+        )
+        columns = np.where(legal, columns, 0)
+        satellite_columns = np.where(legal, satellite_columns, 0)
+        legal &= self.current_reachable()[boards, columns, orientations]
+        self.running &= legal
+        # Drop the pair in from the top rows; gravity settles it below
+        pivot_rows = (dy == -1).astype(np.int64)
+        satellite_rows = (dy == 1).astype(np.int64)
+
+        placed = boards[legal]
+        self.grids[placed, pivot_rows[legal], columns[legal]] = self.pairs[placed, 0, 0]
+        self.grids[placed, satellite_rows[legal], satellite_columns[legal]] = self.pairs[placed, 0, 1]
+
+        score_before = self.scores.copy()
+        self.chain_counts[legal] = 0
+        self.resolve(legal)
+        self.spawn(legal)
+        return self.scores - score_before, np.where(legal, self.chain_counts, 0)
+
+    def apply_gravity(self, mask):
+        grids = self.grids[mask]
+        # A stable sort on occupancy moves empties to the top and keeps puyo order
+        order = np.argsort(grids != 0, axis=1, kind="stable")
+        self.grids[mask] = np.take_along_axis(grids, order, axis=1)
+
+    def label_groups(self, grids):
+        """
+        Labels each cell of a (B, H, W) batch with the lowest flat index in its
+        same-color component; empty cells get -1.
+        """
+        count, height, width = grids.shape
+        cells = height * width
+        occupied = grids != 0
+        # Labels are flat indices within each board while iterating; ``cells`` marks empty
+        labels = np.where(occupied, np.arange(cells).reshape(height, width), cells)
+        # Same-color neighbor masks are fixed for the whole call
+        same_down = occupied[:, 1:, :] & (grids[:, 1:, :] == grids[:, :-1, :])
+        same_right = occupied[:, :, 1:] & (grids[:, :, 1:] == grids[:, :, :-1])
+        # Only boards whose labels changed last sweep are swept again
+        boards = np.arange(count)
+        current, down, right, filled = labels, same_down, same_right, occupied
+        while boards.size:
+            new = current.copy()
+            np.minimum(new[:, :-1, :], np.where(down, current[:, 1:, :], cells), out=new[:, :-1, :])
+            np.minimum(new[:, 1:, :], np.where(down, current[:, :-1, :], cells), out=new[:, 1:, :])
+            np.minimum(new[:, :, :-1], np.where(right, current[:, :, 1:], cells), out=new[:, :, :-1])
+            np.minimum(new[:, :, 1:], np.where(right, current[:, :, :-1], cells), out=new[:, :, 1:])
+            # Pointer jumping: adopt the label of the cell our label points at
+            flat = new.reshape(len(boards), cells)
+            jumped = np.take_along_axis(flat, np.minimum(flat, cells - 1), axis=1)
+            new = np.where(filled, jumped.reshape(new.shape), cells)
+            changed = (new != current).any(axis=(1, 2))
+            if not changed.all():
+                boards, new = boards[changed], new[changed]
+                down, right, filled = down[changed], right[changed], filled[changed]
+            labels[boards] = current = new
+        offsets = (np.arange(count) * cells)[:, None, None]
+        return np.where(occupied, labels + offsets, -1)
+
+    def resolve(self, mask):
+        """Runs gravity, matching, scoring and clearing until no board pops."""
+        active = mask.copy()
+        while active.any():
+            self.apply_gravity(active)
+            indices = np.flatnonzero(active)
+            grids = self.grids[indices]
+            labels = self.label_groups(grids)
+            occupied = grids != 0
+
+            flat_labels = labels[occupied]
+            sizes = np.bincount(flat_labels, minlength=grids.size)
+            cell_sizes = np.zeros(grids.shape, dtype=np.int64)
+            cell_sizes[occupied] = sizes[flat_labels]
+            popping = occupied & (cell_sizes >= self.required_group_number)
+
+            cleared = popping.sum(axis=(1, 2))
+            popped = cleared > 0
+            if not popped.any():
+                break
+
+            colors = np.zeros(len(indices), dtype=np.int64)
+            for code in range(1, len(COLORS) + 1):
+                colors += (popping & (grids == code)).any(axis=(1, 2))
+            roots = popping & (labels == np.arange(grids.size).reshape(grids.shape))
+            root_boards = np.nonzero(roots)[0]
+            group_bonus = np.bincount(
+                root_boards,
+                weights=self.group_bonus_table[cell_sizes[roots]],
+                minlength=len(indices),
+            ).astype(np.int64)
+
+            self.chain_counts[indices[popped]] += 1
+            chains = self.chain_counts[indices]
+            if self.crazy:
+                chain_bonus = 4 * (2**chains)
+            else:
+                chain_bonus = self.chain_bonus_table[np.clip(chains - 1, 0, len(CHAIN_BONUS) - 1)]
+            total = chain_bonus + self.color_bonus_table[colors] + group_bonus
+            total = np.where(total == 0, 1, total)
+            self.scores[indices] += np.where(popped, cleared * 10 * total, 0)
+
+            grids[popping] = 0
+            self.grids[indices] = grids
+            active[indices[~popped]] = False
+
+    def spawn(self, mask):
+        """Shifts the pair queue of the boards in ``mask`` and checks for game over."""
+        count = int(mask.sum())
+        self.pairs[mask, :-1] = self.pairs[mask, 1:]
+        self.pairs[mask, -1] = self.random_pairs((count,))
+        blocked = (self.grids[:, 0, self.spawn_column] != 0) | (
+            self.grids[:, 1, self.spawn_column] != 0
+        )
+        self.running &= ~(mask & blocked)
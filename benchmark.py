@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from time import perf_counter, time
+from constants import *
+from game_state import GameState
+from puyo import Puyo
+from utils import decompose_nuisance, get_puyo_image, get_puyo_text
+
+# Shapes for reverse chain building: (column offset, puyos inserted in that column)
+CHAIN_SHAPES = [
+    [(0, 4)],
+    [(0, 3), (1, 1)],
+    [(0, 1), (1, 3)],
+    [(0, 2), (1, 2)],
+    [(0, 1), (1, 2), (2, 1)],
+    [(0, 2), (1, 1), (2, 1)],
+    [(0, 1), (1, 1), (2, 2)],
+    [(0, 3), (-1, 1)],
+]
+
+def columns_to_grid(columns, grid_height):
+    """Builds a grid from bottom-up lists of colors, one per column."""
+    grid = [[EMPTY] * len(columns) for _ in range(grid_height)]
+    for x, column in enumerate(columns):
+        for i, color in enumerate(column):
+            grid[grid_height - 1 - i][x] = Puyo(color)
+    return grid
+
+def random_board(grid_width, grid_height, fill, seed):
+    """Settled board whose columns are filled to about ``fill`` of the height."""
+    rng = random.Random(seed)
+    columns = [
+        [rng.choice(COLORS) for _ in range(int(grid_height * fill * rng.uniform(0.8, 1.2)))]
+        for _ in range(grid_width)
+    ]
+    return columns_to_grid([column[:grid_height] for column in columns], grid_height)
+
+def chain_board(length, grid_width, grid_height, seed):
+    """
+    Builds a board that resolves as a ``length``-chain by working backwards:
+    each step inserts a new group of four under the existing puyos and keeps it
+    only if the board still pops that group alone and then chains one longer.
+    """
+    rng = random.Random(seed)
+    columns = [[] for _ in range(grid_width)]
+    chain = 0
+    while chain < length:
+        shape = rng.choice(CHAIN_SHAPES)
+        x = rng.randrange(grid_width)
+        xs = [x + dx for dx, _ in shape]
+        if min(xs) < 0 or max(xs) >= grid_width:
+            continue
+        row = rng.randint(0, min(len(columns[c]) for c in xs))
+        color = rng.choice(COLORS)
+        candidate = [list(column) for column in columns]
+        for dx, count in shape:
+            candidate[x + dx][row:row] = [color] * count
+        if max(len(column) for column in candidate) > grid_height - 2:
+            continue
+        state = make_state(columns_to_grid(candidate, grid_height), grid_width, grid_height)
+        state.find_matches()
+        if state.groups_cleared == [4] and len(state.resolve_all()) == chain + 1:
+            columns = candidate
+            chain += 1
+    return columns_to_grid(columns, grid_height)
+
+def make_state(grid, grid_width, grid_height, **kwargs):
+    return GameState(grid, grid_width, grid_height, instant=True, verbose=False, seed=0, **kwargs)
+
+def fixtures():
+    """Seeded boards shared by every benchmark: name -> GameState."""
+    boards = {
+        "empty": make_state(None, DEFAULT_GRID_WIDTH, DEFAULT_GRID_HEIGHT),
+        "half": make_state(random_board(6, 12, 0.5, seed=1), 6, 12),
+        "chain14": make_state(chain_board(14, 6, 26, seed=0), 6, 26),
+        "large": make_state(random_board(30, 40, 0.6, seed=2), 30, 40),
+    }
+    return boards
+
+def measure(fn, setup=None, min_time=0.2):
+    """Calls ``fn`` repeatedly for at least ``min_time`` seconds; setup time is excluded."""
+    calls = 0
+    elapsed = 0.0
+    while elapsed < min_time:
+        if setup:
+            setup()
+        start = perf_counter()
+        fn()
+        elapsed += perf_counter() - start
+        calls += 1
+    return {"calls": calls, "ops_per_sec": calls / elapsed, "mean_us": elapsed / calls * 1e6}
+
+def engine_benchmarks(boards):
+    cases = {}
+    for name, state in boards.items():
+        cases[f"find_matches[{name}]"] = (state.find_matches, None)
+        bitboard = state.clone()
+        bitboard.use_bitboard = True
+        cases[f"find_matches_bitboard[{name}]"] = (bitboard.find_matches, None)
+        cases[f"clone[{name}]"] = (state.clone, None)
+        snapshot = state.snapshot()
+        cases[f"snapshot[{name}]"] = (state.snapshot, None)
+        cases[f"restore[{name}]"] = (lambda state=state, snapshot=snapshot: state.restore(snapshot), None)
+        cases[f"legal_placements[{name}]"] = (state.legal_placements, None)
+
+    half = boards["half"]
+    first = next((x, y) for y, row in enumerate(half.grid) for x, puyo in enumerate(row) if puyo)
+    cases["get_connected_puyos[half]"] = (
+        lambda: half.get_connected_puyos(
+            *first, [[False] * half.grid_width for _ in range(half.grid_height)]
+        ),
+        None,
+    )
+
+    # Gravity over a board with every other puyo removed
+    holes = boards["large"].clone()
+    for y, row in enumerate(holes.grid):
+        for x in range(len(row)):
+            if (x + y) % 2:
+                row[x] = EMPTY
+    holes.rebuild_bitboard()
+    holes_snapshot = holes.snapshot()
+    cases["apply_gravity[large-holes]"] = (holes.apply_gravity, lambda: holes.restore(holes_snapshot))
+
+    scoring_state = boards["half"].clone()
+    scoring_state.colors_cleared = set(COLORS)
+    scoring_state.groups_cleared = [4, 5, 11]
+    cases["update_score[4-color]"] = (lambda: scoring_state.update_score(20, 5), None)
+    crazy_state = scoring_state.clone()
+    crazy_state.crazy = True
+    cases["update_score[crazy-chain30]"] = (lambda: crazy_state.update_score(20, 30), None)
+
+    chain = boards["chain14"]
+    chain_snapshot = chain.snapshot()
+    cases["resolve_all[chain14]"] = (chain.resolve_all, lambda: chain.restore(chain_snapshot))
+
+    cases["get_puyo_text[1e6]"] = (lambda: get_puyo_text(1234567), None)
+    cases["get_puyo_text[1e12]"] = (lambda: get_puyo_text(1234567891234), None)
+    # Uncached, to keep the decomposition itself visible behind the memoized views
+    cases["decompose_nuisance[1e12]"] = (lambda: decompose_nuisance.__wrapped__(1234567891234), None)
+    return cases
+
+def render_benchmarks(boards):
+    """PuyoGame.draw and the nuisance image lookup; skipped when pygame is missing."""
+    try:
+        import pygame
+    except ImportError:
+        return {}
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    from puyo_game import PuyoGame
+
+    cases = {"get_puyo_image[1e6]": (lambda: get_puyo_image(1234567), None)}
+    for name in ("half", "large"):
+        state = boards[name].clone()
+        state.last_nuisance_count = 1234567
+        game = PuyoGame(state, 20, 20 * (state.grid_width + 5), 20 * (state.grid_height + 6))
+        cases[f"PuyoGame.draw[{name}-full]"] = (game.draw, lambda game=game: setattr(game, "needs_full_redraw", True))
+        cases[f"PuyoGame.draw[{name}-move]"] = (game.draw, lambda game=game: move_pair(game.state))
+        # Every puyo pops (all-or-nothing frame change) or one in ten does (incremental path)
+        for share in (1, 10):
+            popping = boards[name].clone()
+            cells = [puyo for row in popping.grid for puyo in row if puyo][::share]
+            for puyo in cells:
+                puyo.state = "popping"
+            game = PuyoGame(popping, 20, 20 * (popping.grid_width + 5), 20 * (popping.grid_height + 6))
+            cases[f"PuyoGame.draw[{name}-popping-1/{share}]"] = (game.draw, lambda cells=cells: next_pop_frame(cells))
+    return cases
+
+def move_pair(state):
+    """Shifts the falling pair one column, bouncing between the walls."""
+    action = "right" if state.current_puyo[0][0] % 2 == 0 else "left"
+    if not state.is_valid_move(state.current_puyo, dx=1 if action == "right" else -1):
+        action = "left" if action == "right" else "right"
+    state.process_input(action)
+
+def next_pop_frame(puyos):
+    """Moves every popping puyo on to its next pre-rendered frame, wrapping around."""
+    for puyo in puyos:
+        puyo.animation_timer = (puyo.animation_timer + POP_TIME / POP_FRAMES) % POP_TIME
+
+def game_throughput(games, seed, grid_width=DEFAULT_GRID_WIDTH, grid_height=DEFAULT_GRID_HEIGHT):
+    """Plays seeded games with random legal placements; returns moves per second."""
+    moves = 0
+    start = perf_counter()
+    for i in range(games):
+        rng = random.Random(seed + i)
+        state = GameState(None, grid_width, grid_height, instant=True, verbose=False, seed=seed + i)
+        while state.running:
+            placements = state.legal_placements()
+            if not placements:
+                break
+            state.place(*rng.choice(placements), check=False)
+            moves += 1
+    elapsed = perf_counter() - start
+    return {"games": games, "moves": moves, "moves_per_sec": moves / elapsed, "elapsed": elapsed}
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine and renderer hot paths.")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per benchmark")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks containing this text")
+    parser.add_argument("--games", type=int, default=50, help="games for the throughput run")
+    parser.add_argument("--no-render", action="store_true", help="skip the pygame benchmarks")
+    parser.add_argument("-o", "--output", default="bench_output.json")
+    args = parser.parse_args(argv)
+
+    boards = fixtures()
+    cases = engine_benchmarks(boards)
+    if not args.no_render:
+        cases.update(render_benchmarks(boards))
+
+    results = {}
+    for name, (fn, setup) in cases.items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(fn, setup, args.min_time)
+        print(f"{name:40} {results[name]['ops_per_sec']:>12.0f} ops/s {results[name]['mean_us']:>10.2f} us")
+    throughput = None
+    if args.filter in "game_throughput":
+        throughput = game_throughput(args.games, seed=0)
+        print(f"{'game_throughput':40} {throughput['moves_per_sec']:>12.0f} moves/s")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "min_time": args.min_time,
+        },
+        "results": results,
+        "game_throughput": throughput,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from constants import NUISANCE
+
+class BitBoard:
+    """
+    Stores the settled board as one integer bitmask per color.
+
+    Cell (x, y) lives at bit ``y * stride + x`` where ``stride`` is the grid
+    width plus one. The extra guard column is never set, so shifting a mask
+    by one bit can not wrap a group from one row into the next.
+    """
+
+    def __init__(self, grid_width, grid_height, masks=None):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.stride = grid_width + 1
+        self.masks = masks if masks is not None else {}
+
+    @classmethod
+    def from_grid(cls, grid, grid_width, grid_height):
+        """Builds the color masks from a grid of Puyo cells, skipping popping puyos."""
+        board = cls(grid_width, grid_height)
+        masks = board.masks
+        stride = board.stride
+        for y, row in enumerate(grid):
+            base = y * stride
+            for x, puyo in enumerate(row):
+                if puyo and puyo.state == "normal":
+                    masks[puyo.color] = masks.get(puyo.color, 0) | (1 << (base + x))
+        return board
+
+    def add(self, color, x, y):
+        self.masks[color] = self.masks.get(color, 0) | (1 << (y * self.stride + x))
+
+    def remove(self, color, x, y):
+        self.masks[color] &= ~(1 << (y * self.stride + x))
+
+    def neighbors(self, mask):
+        """Cells 4-adjacent to ``mask``, clipped to the board."""
+        stride = self.stride
+        board = ((1 << (self.grid_height * stride)) - 1) // ((1 << stride) - 1) * ((1 << self.grid_width) - 1)
+        return ((mask << 1) | (mask >> 1) | (mask << stride) | (mask >> stride)) & board & ~mask
+
+    def flood_fill(self, seed, mask):
+        """Grows ``seed`` through the 4-connected bits of ``mask``."""
+        stride = self.stride
+        group = seed
+        while True:
+            grown = (
+                group | (group << 1) | (group >> 1) | (group << stride) | (group >> stride)
+            ) & mask
+            if grown == group:
+                return group
+            group = grown
+
+    def find_groups(self, min_size):
+        """
+        Returns ``(color, group_mask, size)`` for every group of at least
+        ``min_size`` puyos, ordered by each group's first cell in row-major
+        order, which matches the scan order of ``GameState.find_matches``.
+        Nuisance puyos never form groups.
+        """
+        stride = self.stride
+        groups = []
+        for color, mask in self.masks.items():
+            if color == NUISANCE:
+                continue
+            remaining = mask
+            if min_size > 1:
+                # Isolated puyos can never reach the threshold; skip their fills
+                remaining &= (mask << 1) | (mask >> 1) | (mask << stride) | (mask >> stride)
+            while remaining:
+                seed = remaining & -remaining
+                group = self.flood_fill(seed, mask)
+                remaining &= ~group
+                size = popcount(group)
+                if size >= min_size:
+                    groups.append((seed, color, group, size))
+        groups.sort(key=lambda entry: entry[0])
+        return [(color, group, size) for _, color, group, size in groups]
+
+    def cells(self, mask):
+        """Returns the (x, y) coordinates of the set bits of ``mask``, row-major."""
+        stride = self.stride
+        cells = []
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            cells.append((index % stride, index // stride))
+            mask ^= low
+        return cells
+
+
+def popcount(mask):
+    return bin(mask).count("1")
@@ -0,0 +1,145 @@
+from time import perf_counter
+from constants import COLORS, NUISANCE
+
+# Every unordered color pair with its draw probability; (a, b) and (b, a) reach
+# the same placements once both orientations are considered
+CHANCE_PAIRS = [
+    ((a, b), (1 if a == b else 2) / len(COLORS) ** 2)
+    for i, a in enumerate(COLORS)
+    for b in COLORS[i:]
+]
+GAME_OVER_VALUE = -10**9
+BOARD_COLORS = (*COLORS, NUISANCE)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchBot:
+    """
+    Anytime expectimax over placements. The current pair and the preview
+    queue are expanded exactly; deeper plies average over every pair from
+    COLORS.
+    Each call to choose() deepens until its time budget runs out and returns
+    the best move of the last completed depth.
+    """
+
+    def __init__(self, time_budget=0.01, max_depth=4, beam_width=6):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.beam_width = beam_width
+        self.known_pairs = 0
+        self.table = {}
+        self.deadline = 0
+        self.nodes = 0
+        self.completed_depth = 0
+
+    def choose(self, state):
+        """Returns the (column, orientation) placement to play, or None."""
+        placements = state.legal_placements()
+        if not placements:
+            return None
+        self.deadline = perf_counter() + self.time_budget
+        self.known_pairs = 1 + state.preview_depth
+        self.table = {}
+        self.nodes = 0
+        self.completed_depth = 0
+        children = self.expand(state, root=True)
+        best = children[0][1]
+        for depth in range(1, self.max_depth + 1):
+            if depth > 1:
+                # Deeper iterations only follow the most promising root moves
+                children = children[: self.beam_width]
+            try:
+                scored = [
+                    (reward + self.search(child, depth - 1, 1), placement, reward, child)
+                    for _, placement, reward, child in children
+                ]
+            except SearchTimeout:
+                break
+            # Order the next iteration by this one's results
+            scored.sort(key=lambda entry: entry[0], reverse=True)
+            children = scored
+            best = children[0][1]
+            self.completed_depth = depth
+        return best
+
+    def expand(self, state, colors=None, root=False):
+        """
+        Returns (ordering value, placement, reward, child) for every placement
+        of the current pair, best first, recoloring it with ``colors`` if given.
+        Only the root expansion ignores the deadline.
+        """
+        if colors is not None:
+            state = state.clone()
+            state.current_puyo = [[x, y, color] for (x, y, _), color in zip(state.current_puyo, colors)]
+        children = []
+        for placement in state.legal_placements():
+            if not root and perf_counter() > self.deadline:
+                raise SearchTimeout
+            # Clones get their own copy of the pair generator, so the real game's
+            # sequence never advances
+            child = state.clone()
+            child.instant = True
+            child.verbose = False
+            child.use_bitboard = True
+            child.place(*placement, check=False)
+            reward = child.score - state.score
+            children.append((reward + self.evaluate(child), placement, reward, child))
+        children.sort(key=lambda entry: entry[0], reverse=True)
+        return children
+
+    def search(self, state, depth, ply):
+        self.nodes += 1
+        if perf_counter() > self.deadline:
+            raise SearchTimeout
+        if not state.running:
+            return GAME_OVER_VALUE
+        if depth == 0:
+            return self.evaluate(state)
+        known = ply < self.known_pairs
+        key = (self.board_key(state), self.pair_key(state, ply), depth)
+        if key in self.table:
+            return self.table[key]
+        if known:
+            value = self.best_child(state, None, depth, ply)
+        else:
+            value = sum(
+                probability * self.best_child(state, colors, depth, ply)
+                for colors, probability in CHANCE_PAIRS
+            )
+        self.table[key] = value
+        return value
+
+    def best_child(self, state, colors, depth, ply):
+        children = self.expand(state, colors)
+        if not children:
+            return GAME_OVER_VALUE
+        return max(
+            reward + self.search(child, depth - 1, ply + 1)
+            for _, _, reward, child in children[: self.beam_width]
+        )
+
+    @staticmethod
+    def board_key(state):
+        """The settled board as its color masks; search states always keep the bitboard."""
+        masks = state.bitboard.masks
+        return tuple(masks.get(color, 0) for color in BOARD_COLORS)
+
+    def pair_key(self, state, ply):
+        pairs = (state.current_puyo, *state.preview)
+        return tuple(
+            (pair[0][2], pair[1][2]) for pair in pairs[: max(self.known_pairs - ply, 0)]
+        )
+
+    @staticmethod
+    def evaluate(state):
+        """Static value: reward connected groups, punish tall columns and a blocked spawn."""
+        if not state.running:
+            return GAME_OVER_VALUE
+        connection = sum(size * size for _, _, size in state.bitboard.find_groups(2))
+        height = sum(height * height for height in state.heights)
+        spawn = state.heights[(state.grid_width - 1) // 2]
+        danger = 1000 if spawn >= state.grid_height - 3 else 0
+        return connection * 10 - height - danger
@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+from multiprocessing import Pool
+from constants import DEFAULT_GRID_WIDTH, DEFAULT_GRID_HEIGHT
+
+def game_parser(description, max_moves, max_moves_help=None, workers_help=None):
+    """
+    Returns an ArgumentParser with the options every headless tool shares:
+    board rules, search budget, move limit and worker count.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--width", type=int, default=DEFAULT_GRID_WIDTH)
+    parser.add_argument("--height", type=int, default=DEFAULT_GRID_HEIGHT)
+    parser.add_argument("--group", type=int, default=4, help="puyos needed to pop a group")
+    parser.add_argument("--crazy", action="store_true")
+    parser.add_argument("--budget", type=float, default=0.01, help="search seconds per move")
+    parser.add_argument("--max-moves", type=int, default=max_moves, help=max_moves_help)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help=workers_help)
+    return parser
+
+def game_options(args, **extra):
+    """The options passed to every job: the shared game_parser options plus ``extra``."""
+    return dict(
+        width=args.width,
+        height=args.height,
+        group=args.group,
+        crazy=args.crazy,
+        budget=args.budget,
+        max_moves=args.max_moves,
+        **extra,
+    )
+
+def run_jobs(worker, jobs, workers):
+    """Runs ``worker`` on every job, spread over a process pool; results come back unordered."""
+    if workers > 1 and len(jobs) > 1:
+        with Pool(workers) as pool:
+            return list(pool.imap_unordered(worker, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    return [worker(job) for job in jobs]
+
+def summarize(results, elapsed, options, unit, **stats):
+    """
+    Summary of a run: its options, the number of ``unit`` played, the time
+    taken, ``stats``, then every result ordered by seed.
+    """
+    return {
+        "options": options,
+        unit: len(results),
+        "elapsed": elapsed,
+        **stats,
+        "results": sorted(results, key=lambda result: result["seed"]),
+    }
+
+def write_json(data, path=None):
+    """Writes ``data`` as indented JSON to ``path``, or to stdout."""
+    if path:
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+    else:
+        json.dump(data, sys.stdout, indent=2)
+        print()
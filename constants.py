@@ -1,16 +1,23 @@
-import pygame
-
 DEFAULT_GRID_WIDTH = 6
 DEFAULT_GRID_HEIGHT = 12
 BASE_TILE_SIZE = 40
 FPS = 60
+TICK_RATE = 60  # Simulation ticks per second, independent of FPS
+MAX_TICKS_PER_FRAME = 5  # Catch-up limit; time beyond it is dropped
 MAX_SCREEN_WIDTH = 1920
 MAX_SCREEN_HEIGHT = 1080
 MIN_TILE_SIZE = 15
 
 COLORS = ["red", "green", "blue", "yellow"]
 EMPTY = None
+NUISANCE = "nuisance"  # Garbage: never forms groups, cleared next to a popped group
+TARGET_POINTS = 70  # Score worth one nuisance puyo
 POP_TIME = 0.7
+POP_FRAMES = 8  # Pre-rendered frames of the pop animation
+
+# Satellite offset from the pivot for each orientation, in rotate_cw order
+# (spawn orientation first: satellite below the pivot)
+ROTATION_OFFSETS = [(0, 1), (-1, 0), (0, -1), (1, 0)]
 
 CHAIN_BONUS = [0, 8, 16, 32, 64, 96, 128, 160, 192, 224, 256]
 COLOR_BONUS = [0, 3, 6, 12, 24]
@@ -21,6 +28,7 @@ COLOR_MAP = {
     "green": (0, 255, 0),
     "blue": (0, 0, 255),
     "yellow": (255, 255, 0),
+    NUISANCE: (160, 160, 160),
     EMPTY: (0, 0, 0),
 }
 
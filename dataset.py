@@ -0,0 +1,129 @@
+import json
+import os
+from time import perf_counter
+import numpy as np
+import cli
+from env import encode_action, observe
+from game_state import GameState
+from selfplay import POLICIES, make_policy
+from utils import ceildiv
+
+SHARD_NAME = "shard-{:04d}.npy"
+META_NAME = "meta.json"
+GAMES_PER_SHARD = 1_000_000  # Spacing of game seeds between shards
+
+def record_dtype(grid_width, grid_height, preview_depth):
+    """Fixed-width record: a position, the placement played from it and what it scored."""
+    return np.dtype(
+        [
+            ("board", np.int8, (grid_height, grid_width)),  # env.COLOR_CODES
+            ("pairs", np.int8, (1 + preview_depth, 2)),  # Current pair, then the previews
+            ("action", np.uint8),  # env.encode_action(column, orientation)
+            ("column", np.uint8),
+            ("orientation", np.uint8),
+            ("chain", np.uint16),  # Chain length the placement triggered
+            ("score", np.int64),  # Score gained through update_score
+            ("game_over", np.bool_),
+            ("seed", np.int64),  # Game seed, to replay the position
+            ("move", np.uint32),  # Placements before this one in that game
+        ]
+    )
+
+def write_shard(job):
+    """
+    Plays seeded games with one policy and streams every placement into a
+    memory-mapped .npy shard until it holds ``count`` records.
+    """
+    index, count, options = job
+    dtype = record_dtype(options["width"], options["height"], options["preview"])
+    path = os.path.join(options["output"], SHARD_NAME.format(index))
+    shard = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(count,))
+    written = 0
+    games = 0
+    while written < count:
+        seed = options["seed"] + index * GAMES_PER_SHARD + games
+        games += 1
+        state = GameState(
+            None,
+            options["width"],
+            options["height"],
+            required_group_number=options["group"],
+            crazy=options["crazy"],
+            use_bitboard=True,
+            instant=True,
+            verbose=False,
+            seed=seed,
+            preview_depth=options["preview"],
+        )
+        choose = make_policy(options["policy"], seed, options["budget"])
+        move = 0
+        while state.running and move < options["max_moves"] and written < count:
+            placement = choose(state)
+            if placement is None:
+                break
+            obs = observe(state)
+            state.place(*placement, check=False)
+            record = shard[written]
+            record["board"] = obs["board"]
+            record["pairs"] = obs["pairs"]
+            record["action"] = encode_action(*placement)
+            record["column"], record["orientation"] = placement
+            record["chain"] = len(state.chain_trace)
+            record["score"] = sum(link.score for link in state.chain_trace)
+            record["game_over"] = not state.running
+            record["seed"] = seed
+            record["move"] = move
+            written += 1
+            move += 1
+    shard.flush()
+    del shard
+    return {"shard": index, "path": path, "records": count, "games": games}
+
+def open_shards(directory):
+    """Returns every shard of a dataset as a read-only memory map (no data is copied)."""
+    with open(os.path.join(directory, META_NAME)) as f:
+        meta = json.load(f)
+    return [np.load(os.path.join(directory, shard["path"]), mmap_mode="r") for shard in meta["shards"]]
+
+def parse_args(argv=None):
+    parser = cli.game_parser(
+        "Generate a sharded dataset of played positions.",
+        max_moves=1000,
+        max_moves_help="placements per game",
+        workers_help="one shard per worker",
+    )
+    parser.add_argument("-n", "--records", type=int, default=100_000)
+    parser.add_argument("--preview", type=int, default=2, help="preview pairs stored per position")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=POLICIES, default="greedy")
+    parser.add_argument("-o", "--output", default="dataset", help="directory for the shards")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = cli.game_options(
+        args, preview=args.preview, seed=args.seed, policy=args.policy, output=args.output
+    )
+    os.makedirs(args.output, exist_ok=True)
+    per_shard = ceildiv(args.records, args.workers)
+    jobs = []
+    for index in range(args.workers):
+        count = min(per_shard, args.records - index * per_shard)
+        if count > 0:
+            jobs.append((index, count, options))
+    start = perf_counter()
+    shards = sorted(cli.run_jobs(write_shard, jobs, len(jobs)), key=lambda shard: shard["shard"])
+    elapsed = perf_counter() - start
+    meta = {
+        "options": options,
+        "dtype": np.lib.format.dtype_to_descr(record_dtype(args.width, args.height, args.preview)),
+        "records": sum(shard["records"] for shard in shards),
+        "elapsed": elapsed,
+        "shards": [dict(shard, path=os.path.basename(shard["path"])) for shard in shards],
+    }
+    with open(os.path.join(args.output, META_NAME), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"{meta['records']} records in {len(shards)} shards, {meta['records'] / elapsed:.0f} records/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import numpy as np
+from constants import *
+from game_state import GameState
+from batch_engine import BatchEngine
+
+INPUT_ACTIONS = ["left", "right", "rotate_cw", "rotate_ccw", "drop", "hard_drop"]
+COLOR_CODES = {color: code for code, color in enumerate(COLORS, start=1)}
+COLOR_CODES[NUISANCE] = len(COLORS) + 1
+COLOR_CODES[EMPTY] = 0
+
+def encode_action(column, orientation):
+    """Packs a placement into the integer action used by the environments."""
+    return column * len(ROTATION_OFFSETS) + orientation
+
+def decode_action(action):
+    """Returns the (column, orientation) placement for an integer action."""
+    return divmod(int(action), len(ROTATION_OFFSETS))
+
+def observe(state):
+    """Encodes a GameState as arrays of color codes (0 is empty)."""
+    board = np.array(
+        [[COLOR_CODES[puyo.color] if puyo else 0 for puyo in row] for row in state.grid],
+        dtype=np.int8,
+    )
+    pairs = np.zeros((1 + state.preview_depth, 2), dtype=np.int8)
+    piece = np.zeros((2, 3), dtype=np.int8)
+    for i, pair in enumerate((state.current_puyo, *state.preview)):
+        if pair:
+            pairs[i] = [COLOR_CODES[pair[0][2]], COLOR_CODES[pair[1][2]]]
+    if state.current_puyo:
+        piece[:] = [[x, y, COLOR_CODES[color]] for x, y, color in state.current_puyo]
+    return {"board": board, "pairs": pairs, "piece": piece}
+
+
+class PuyoEnv:
+    """
+    Gym-style environment around one GameState. Chains resolve instantly.
+
+    An action is an integer placement (see encode_action), a (column,
+    orientation) tuple, or one of the process_input strings. The reward is
+    the score gained by the step. A placement the current pair cannot reach
+    ends the game, as it does on VectorPuyoEnv.
+    """
+
+    def __init__(
+        self,
+        grid_width=DEFAULT_GRID_WIDTH,
+        grid_height=DEFAULT_GRID_HEIGHT,
+        required_group_number=4,
+        crazy=False,
+        preview_depth=2,
+    ):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.required_group_number = required_group_number
+        self.crazy = crazy
+        self.preview_depth = preview_depth
+        self.num_actions = grid_width * len(ROTATION_OFFSETS)
+        self.state = None
+        self.placements = None
+
+    def reset(self, seed=None):
+        self.state = GameState(
+            None,
+            self.grid_width,
+            self.grid_height,
+            required_group_number=self.required_group_number,
+            crazy=self.crazy,
+            use_bitboard=True,
+            instant=True,
+            verbose=False,
+            seed=seed,
+            preview_depth=self.preview_depth,
+        )
+        self.placements = None
+        return observe(self.state)
+
+    def legal_placements(self):
+        """The state's legal_placements, computed once per step."""
+        if self.placements is None:
+            self.placements = self.state.legal_placements()
+        return self.placements
+
+    def legal_actions(self):
+        """Returns the integer placements the current pair can reach."""
+        return [encode_action(*placement) for placement in self.legal_placements()]
+
+    def step(self, action):
+        state = self.state
+        score_before = state.score
+        state.chain_trace = []
+        placed = False
+        if isinstance(action, str):
+            state.process_input(action)
+            placed = None
+        elif state.current_puyo:
+            placement = action if isinstance(action, tuple) else decode_action(action)
+            placed = placement in self.legal_placements()
+            if placed:
+                state.place(*placement, check=False)
+            else:
+                state.running = False
+        self.placements = None
+        info = {"chain": len(state.chain_trace), "trace": state.chain_trace, "placed": placed}
+        return observe(state), state.score - score_before, not state.running, info
+
+
+class VectorPuyoEnv:
+    """
+    Steps many boards per call on a BatchEngine. Actions are integer
+    placements, one per board, and observations are PuyoEnv's stacked along a
+    leading board axis. As on PuyoEnv, an unreachable placement ends its
+    board. Finished boards are reset automatically; their ``done`` flag is set
+    on the step that ended them.
+    """
+
+    def __init__(
+        self,
+        num_envs,
+        grid_width=DEFAULT_GRID_WIDTH,
+        grid_height=DEFAULT_GRID_HEIGHT,
+        required_group_number=4,
+        crazy=False,
+        preview_depth=2,
+    ):
+        self.num_envs = num_envs
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.required_group_number = required_group_number
+        self.crazy = crazy
+        self.preview_depth = preview_depth
+        self.num_actions = grid_width * len(ROTATION_OFFSETS)
+        self.engine = None
+
+    def reset(self, seed=None):
+        self.engine = BatchEngine(
+            self.num_envs,
+            self.grid_width,
+            self.grid_height,
+            self.required_group_number,
+            self.crazy,
+            self.preview_depth,
+            seed=seed,
+        )
+        return self.observe()
+
+    def observe(self):
+        engine = self.engine
+        # Between steps every pair waits at the spawn point, satellite below the pivot
+        piece = np.zeros((self.num_envs, 2, 3), dtype=np.int8)
+        piece[:, :, 0] = engine.spawn_column
+        piece[:, 1, 1] = 1
+        piece[:, :, 2] = engine.pairs[:, 0]
+        return {"board": engine.grids.copy(), "pairs": engine.pairs.copy(), "piece": piece}
+
+    def action_mask(self):
+        """Returns an (N, num_actions) mask of placements that fit on each board."""
+        return self.engine.legal_mask().reshape(self.num_envs, self.num_actions)
+
+    def step(self, actions):
+        columns, orientations = np.divmod(np.asarray(actions, dtype=np.int64), len(ROTATION_OFFSETS))
+        rewards, chains = self.engine.step(columns, orientations)
+        dones = ~self.engine.running
+        if dones.any():
+            self.engine.reset(dones)
+        return self.observe(), rewards, dones, {"chain": chains}
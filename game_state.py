@@ -1,10 +1,101 @@
-import random
-import copy
+import struct
 from time import time
-from collections import deque
+from collections import deque, namedtuple
 from constants import *
-from utils import get_puyo_image, get_puyo_text
+from utils import get_puyo_text
+import scoring
 from puyo import Puyo
+from bitboard import BitBoard
+from pair_generator import PairGenerator
+
+# One step of a chain resolved by GameState.resolve_all
+ChainLink = namedtuple("ChainLink", ["chain", "cells", "colors", "group_sizes", "score"])
+
+# Immutable copy of a GameState; see GameState.snapshot
+GameSnapshot = namedtuple("GameSnapshot", ["board", "pairs", "matches", "header", "generator"])
+
+# Rotation tables over ROTATION_OFFSETS indices
+ROTATION_INDEX = {offset: index for index, offset in enumerate(ROTATION_OFFSETS)}
+ROTATE_CW = [(index + 1) % len(ROTATION_OFFSETS) for index in range(len(ROTATION_OFFSETS))]
+ROTATE_CCW = [(index - 1) % len(ROTATION_OFFSETS) for index in range(len(ROTATION_OFFSETS))]
+
+# Scalar (or tuple-converted) attributes carried in GameSnapshot.header
+SNAPSHOT_FIELDS = (
+    "preview_depth",
+    "grid_width",
+    "grid_height",
+    "required_group_number",
+    "crazy",
+    "instant",
+    "verbose",
+    "score",
+    "fall_timer",
+    "fall_speed",
+    "running",
+    "clearing",
+    "chain_count",
+    "delta_time",
+    "start_time",
+    "last_nuisance_count",
+)
+
+# Packed layout (see GameState.to_bytes)
+#   header:  version, width, height, group size, preview depth, flags, seed,
+#            pairs drawn from the generator, score, chain count
+#   current: (x, y, cell code) for pivot and satellite, zeros without a pair
+#   preview: one byte per pair, pivot code << 3 | satellite code
+#   grid:    3 bits per cell, row-major from the top-left, little-endian
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<BBBBBBqQqH")
+PACK_CURRENT = struct.Struct("<6B")
+PACK_CRAZY = 1
+PACK_RUNNING = 2
+PACK_HAS_CURRENT = 4
+PACK_SEEDED = 8
+CELL_COLORS = [EMPTY, *COLORS, NUISANCE]
+CELL_CODES = {color: code for code, color in enumerate(CELL_COLORS)}
+DELTA_FULL = 0
+DELTA_RUNS = 1
+DELTA_RUN = struct.Struct("<HH")
+
+def encode_delta(previous, current):
+    """
+    Encodes ``current`` as the byte runs that differ from ``previous``;
+    falls back to a full copy when the two packed states differ in size.
+    """
+    if len(previous) != len(current) or len(current) > 0xFFFF:
+        return bytes([DELTA_FULL]) + bytes(current)
+    out = bytearray([DELTA_RUNS])
+    size = len(current)
+    i = 0
+    while i < size:
+        if previous[i] == current[i]:
+            i += 1
+            continue
+        start = end = i
+        # Extend the run over gaps too short to pay for a new run header
+        while i < size and i - end <= DELTA_RUN.size:
+            if previous[i] != current[i]:
+                end = i + 1
+            i += 1
+        out += DELTA_RUN.pack(start, end - start)
+        out += current[start:end]
+        i = end
+    return bytes(out)
+
+def apply_delta(previous, delta):
+    """Rebuilds the packed state that encode_delta(previous, ...) was given."""
+    delta = memoryview(delta)
+    if delta[0] == DELTA_FULL:
+        return bytes(delta[1:])
+    out = bytearray(previous)
+    offset = 1
+    while offset < len(delta):
+        start, length = DELTA_RUN.unpack_from(delta, offset)
+        offset += DELTA_RUN.size
+        out[start : start + length] = delta[offset : offset + length]
+        offset += length
+    return bytes(out)
 
 class GameState:
     def __init__(
@@ -21,7 +112,17 @@ class GameState:
         running=True,
         required_group_number=4,
         crazy=False,
+        use_bitboard=False,
+        instant=False,
+        verbose=True,
+        seed=None,
+        preview_depth=2,
+        generator=None,
     ):
+        if preview_depth < 2:
+            raise ValueError("preview_depth must be at least 2 (next and next-next)")
+        self.generator = generator if generator is not None else PairGenerator(seed)
+        self.preview_depth = preview_depth
         self.required_group_number = required_group_number
         self.grid_width = grid_width
         self.grid_height = grid_height
@@ -30,9 +131,18 @@ class GameState:
             if grid
             else [[EMPTY for _ in range(grid_width)] for _ in range(grid_height)]
         )
+        self.rebuild_heights()
+        self.bitboard = None
         self.current_puyo = current_puyo if current_puyo else self.generate_puyo()
-        self.next_puyo = next_puyo if next_puyo else self.generate_puyo()
-        self.next_next_puyo = next_next_puyo if next_next_puyo else self.generate_puyo()
+        # Upcoming pairs; next_puyo and next_next_puyo are the first two
+        self.preview = deque(
+            [
+                next_puyo if next_puyo else self.generate_puyo(),
+                next_next_puyo if next_next_puyo else self.generate_puyo(),
+            ]
+        )
+        while len(self.preview) < preview_depth:
+            self.preview.append(self.generate_puyo())
         self.score = score
         self.fall_timer = fall_timer
         self.fall_speed = fall_speed
@@ -41,27 +151,242 @@ class GameState:
         self.chain_count = 0
         self.delta_time = 0
         self.crazy = crazy
+        self.use_bitboard = use_bitboard  # Keeps self.bitboard and matches with it instead of BFS
+        self.instant = instant  # Resolve chains on lock instead of through animation ticks
+        self.verbose = verbose  # Print a line per chain link
+        self.to_clear = []
+        self.colors_cleared = set()
+        self.groups_cleared = []
+        self.chain_trace = []
+        self.stats = None  # EngineStats once instrumentation.instrument() is applied
         self.start_time = time()  # Track the time the game starts
-        self.last_nuisance_images: list[pygame.Surface] = []
-        self.last_nuisance_text: str = ""
+        self.last_nuisance_count = 0
+
+    @property
+    def next_puyo(self):
+        return self.preview[0]
+
+    @next_puyo.setter
+    def next_puyo(self, pair):
+        self.preview[0] = pair
+
+    @property
+    def next_next_puyo(self):
+        return self.preview[1]
+
+    @next_next_puyo.setter
+    def next_next_puyo(self, pair):
+        self.preview[1] = pair
+
+    @property
+    def last_nuisance_text(self):
+        """Text form of the last nuisance count, built only when asked for."""
+        return get_puyo_text(self.last_nuisance_count)
 
     def generate_puyo(self):
+        pivot, satellite = self.generator.next_pair()
         return [
-            [(self.grid_width - 1) // 2, 0, random.choice(COLORS)],
-            [(self.grid_width - 1) // 2, 1, random.choice(COLORS)],
+            [(self.grid_width - 1) // 2, 0, pivot],
+            [(self.grid_width - 1) // 2, 1, satellite],
         ]
 
     def clone(self):
-        return GameState(
-            grid=[[copy.deepcopy(cell) for cell in row] for row in self.grid],
-            current_puyo=copy.deepcopy(self.current_puyo),
-            next_puyo=copy.deepcopy(self.next_puyo),
-            next_next_puyo=copy.deepcopy(self.next_next_puyo),
-            score=self.score,
-            fall_timer=self.fall_timer,
-            fall_speed=self.fall_speed,
-            running=self.running,
+        return GameState.from_snapshot(self.snapshot())
+
+    def snapshot(self):
+        """
+        Returns an immutable GameSnapshot of every field. Settled puyos are
+        stored as their color string; popping ones as (color, state, timer).
+        """
+        board = tuple(
+            tuple(
+                EMPTY
+                if puyo is EMPTY
+                else puyo.color
+                if puyo.state == "normal" and not puyo.animation_timer
+                else (puyo.color, puyo.state, puyo.animation_timer)
+                for puyo in row
+            )
+            for row in self.grid
+        )
+        pairs = tuple(
+            tuple(tuple(puyo) for puyo in pair) if pair else None
+            for pair in (self.current_puyo, *self.preview)
+        )
+        matches = (
+            tuple(self.to_clear),
+            frozenset(self.colors_cleared),
+            tuple(self.groups_cleared),
+            tuple(self.chain_trace),
+            tuple(self.heights),
+            tuple(self.bitboard.masks.items()) if self.bitboard else None,
         )
+        header = tuple(getattr(self, field) for field in SNAPSHOT_FIELDS)
+        return GameSnapshot(board, pairs, matches, header, self.generator.getstate())
+
+    def restore(self, snapshot):
+        """Overwrites this state in place with the contents of a GameSnapshot."""
+        for field, value in zip(SNAPSHOT_FIELDS, snapshot.header):
+            setattr(self, field, value)
+        self.grid = [
+            [
+                EMPTY
+                if cell is EMPTY
+                else Puyo(cell)
+                if cell.__class__ is str
+                else Puyo(*cell)
+                for cell in row
+            ]
+            for row in snapshot.board
+        ]
+        current_puyo, *preview = snapshot.pairs
+        self.current_puyo = [list(puyo) for puyo in current_puyo] if current_puyo else None
+        self.preview = deque([list(puyo) for puyo in pair] for pair in preview)
+        self.generator = PairGenerator.from_state(snapshot.generator)
+        to_clear, colors_cleared, groups_cleared, chain_trace, heights, masks = snapshot.matches
+        self.to_clear = list(to_clear)
+        self.colors_cleared = set(colors_cleared)
+        self.groups_cleared = list(groups_cleared)
+        self.chain_trace = list(chain_trace)
+        self.heights = list(heights)
+        self.bitboard = BitBoard(self.grid_width, self.grid_height, dict(masks)) if masks is not None else None
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Builds a new GameState from a snapshot without drawing any random pairs."""
+        state = cls.__new__(cls)
+        state.stats = None
+        state.restore(snapshot)
+        return state
+
+    def tick(self, fast=False, delta_time=1 / TICK_RATE):
+        """
+        Advances the game by one fixed simulation step: the pop animation runs
+        ``delta_time`` seconds, otherwise the fall timer counts one tick (five
+        when ``fast``). Returns True if the timer ran out and dropped the pair.
+        """
+        if self.clearing:
+            self.update_clearing(delta_time)
+            return False
+        self.fall_timer += 5 if fast else 1
+        if self.fall_timer >= self.fall_speed:
+            self.fall_timer = 0
+            self.process_input("drop")
+            return True
+        return False
+
+    def to_bytes(self):
+        """
+        Packs the position: rules, score, chain count, current and preview
+        pairs, and the grid at 3 bits per cell. Pop animations, timers and
+        the display options are not kept.
+        """
+        seed = self.generator.seed
+        seeded = isinstance(seed, int) and -(2**63) <= seed < 2**63
+        flags = (
+            (PACK_CRAZY if self.crazy else 0)
+            | (PACK_RUNNING if self.running else 0)
+            | (PACK_HAS_CURRENT if self.current_puyo else 0)
+            | (PACK_SEEDED if seeded else 0)
+        )
+        out = bytearray(
+            PACK_HEADER.pack(
+                PACK_VERSION,
+                self.grid_width,
+                self.grid_height,
+                self.required_group_number,
+                self.preview_depth,
+                flags,
+                seed if seeded else 0,
+                self.generator.drawn,
+                self.score,
+                self.chain_count,
+            )
+        )
+        if self.current_puyo:
+            (px, py, pivot), (sx, sy, satellite) = self.current_puyo
+            out += PACK_CURRENT.pack(px, py, CELL_CODES[pivot], sx, sy, CELL_CODES[satellite])
+        else:
+            out += bytes(PACK_CURRENT.size)
+        out += bytes(CELL_CODES[pair[0][2]] << 3 | CELL_CODES[pair[1][2]] for pair in self.preview)
+        cells = 0
+        shift = 0
+        for row in self.grid:
+            for puyo in row:
+                if puyo:
+                    cells |= CELL_CODES[puyo.color] << shift
+                shift += 3
+        out += cells.to_bytes((shift + 7) // 8, "little")
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data, **kwargs):
+        """
+        Rebuilds a GameState from to_bytes(), reading ``data`` through a
+        memoryview. A seeded state continues its pair sequence exactly;
+        ``kwargs`` set the options that are not packed (instant, verbose, ...).
+        """
+        data = memoryview(data)
+        (
+            version,
+            grid_width,
+            grid_height,
+            required_group_number,
+            preview_depth,
+            flags,
+            seed,
+            drawn,
+            score,
+            chain_count,
+        ) = PACK_HEADER.unpack_from(data, 0)
+        if version != PACK_VERSION:
+            raise ValueError(f"Unsupported packed GameState version {version}")
+        offset = PACK_HEADER.size
+        px, py, pivot, sx, sy, satellite = PACK_CURRENT.unpack_from(data, offset)
+        offset += PACK_CURRENT.size
+        current_puyo = None
+        if flags & PACK_HAS_CURRENT:
+            current_puyo = [[px, py, CELL_COLORS[pivot]], [sx, sy, CELL_COLORS[satellite]]]
+        spawn = (grid_width - 1) // 2
+        preview = [
+            [[spawn, 0, CELL_COLORS[code >> 3]], [spawn, 1, CELL_COLORS[code & 7]]]
+            for code in data[offset : offset + preview_depth]
+        ]
+        offset += preview_depth
+        size = grid_width * grid_height
+        cells = int.from_bytes(data[offset : offset + (size * 3 + 7) // 8], "little")
+        grid = []
+        for y in range(grid_height):
+            row = []
+            for x in range(grid_width):
+                code = cells & 7
+                row.append(Puyo(CELL_COLORS[code]) if code else EMPTY)
+                cells >>= 3
+            grid.append(row)
+
+        generator = PairGenerator(seed if flags & PACK_SEEDED else None)
+        if flags & PACK_SEEDED:
+            generator.advance(drawn)
+        # Every pair is passed in so the constructor draws nothing from the generator
+        state = cls(
+            grid,
+            grid_width,
+            grid_height,
+            current_puyo=current_puyo or preview[0],
+            next_puyo=preview[0],
+            next_next_puyo=preview[1],
+            score=score,
+            running=bool(flags & PACK_RUNNING),
+            required_group_number=required_group_number,
+            crazy=bool(flags & PACK_CRAZY),
+            generator=generator,
+            **kwargs,
+        )
+        state.current_puyo = current_puyo
+        state.preview = deque(preview)
+        state.preview_depth = preview_depth
+        state.chain_count = chain_count
+        return state
 
     def process_input(self, action):
         if self.current_puyo and not self.clearing:  # Prevent input during clearing
@@ -88,21 +413,21 @@ class GameState:
                 self.lock_puyo()
                 self.current_puyo = None  # Remove current puyo from play
                 self.chain_count = 0  # Reset chain count
-                self.resolve()
+                self.settle()
             else:
                 for puyo in self.current_puyo:
                     puyo[1] += 1
 
     def hard_drop(self):
         if self.current_puyo:
-            while self.is_valid_move(self.current_puyo, dy=1):
-                for puyo in self.current_puyo:
-                    puyo[1] += 1
+            distance = self.drop_distance(self.current_puyo)
+            for puyo in self.current_puyo:
+                puyo[1] += distance
             self.lock_puyo()
             self.fall_timer = 0
             self.current_puyo = None
             self.chain_count = 0
-            self.resolve()
+            self.settle()
 
     def rotate_puyo(self, clockwise=True):
         if self.current_puyo:
@@ -120,13 +445,94 @@ class GameState:
             if self.is_valid_position(new_satellite[0], new_satellite[1]):
                 self.current_puyo[1] = new_satellite
 
+    def drop_distance(self, puyo_pair):
+        """Returns how many rows the pair can fall, read from the column heights."""
+        distance = self.grid_height
+        for x, y, color in puyo_pair:
+            # Lowest free row in the column, minus any pair puyo that lands under this one
+            floor = self.grid_height - self.heights[x] - 1
+            for ox, oy, _ in puyo_pair:
+                if ox == x and oy > y:
+                    floor -= 1
+            distance = min(distance, floor - y)
+        return max(distance, 0)
+
+    def legal_placements(self):
+        """
+        Returns the sorted (column, orientation) placements the current pair can
+        reach with move, rotate and drop inputs. ``column`` is the pivot column
+        and ``orientation`` indexes ROTATION_OFFSETS.
+        """
+        if not self.current_puyo:
+            return []
+        (px, py, _), (sx, sy, _) = self.current_puyo
+        # Free cells only get scarcer further down, so any path can be lifted to
+        # the current row, or row 1 where the satellite has room to sit on top
+        lowest = max(py, 1)
+        tops = [self.grid_height - height for height in self.heights]
+        width = self.grid_width
+
+        def fits(x, y, orientation):
+            dx, dy = ROTATION_OFFSETS[orientation]
+            return (
+                0 <= x < width
+                and 0 <= y < tops[x]
+                and 0 <= x + dx < width
+                and 0 <= y + dy < tops[x + dx]
+            )
+
+        start = (px, py, ROTATION_INDEX[(sx - px, sy - py)])
+        seen = {start}
+        stack = [start]
+        while stack:
+            x, y, o = stack.pop()
+            for move in (
+                (x - 1, y, o),
+                (x + 1, y, o),
+                (x, y, ROTATE_CW[o]),
+                (x, y, ROTATE_CCW[o]),
+                (x, y + 1, o),
+            ):
+                if move[1] <= lowest and move not in seen and fits(*move):
+                    seen.add(move)
+                    stack.append(move)
+        return sorted({(x, o) for x, _, o in seen})
+
+    def place(self, column, orientation, check=True):
+        """
+        Moves the current pair straight to a placement and hard drops it.
+        Pass ``check=False`` for placements already taken from legal_placements.
+        """
+        if check and (column, orientation) not in self.legal_placements():
+            raise ValueError(f"Placement ({column}, {orientation}) is not reachable")
+        dx, dy = ROTATION_OFFSETS[orientation]
+        row = 1 if dy < 0 else 0
+        column = int(column)  # NumPy actions would overflow the bitmask shifts
+        pivot, satellite = self.current_puyo
+        self.current_puyo = [
+            [column, row, pivot[2]],
+            [column + dx, row + dy, satellite[2]],
+        ]
+        self.hard_drop()
+
     def lock_puyo(self):
+        board = self.bitboard
         for x, y, color in self.current_puyo:
+            if board:
+                if self.grid[y][x]:  # Only after game over, when the pair spawned on the stack
+                    board.remove(self.grid[y][x].color, x, y)
+                board.add(color, x, y)
             self.grid[y][x] = Puyo(color)
+            self.heights[x] = max(self.heights[x], self.grid_height - y)
+
+    def settle(self):
+        if self.instant:
+            self.chain_trace = self.resolve_all()
+        else:
+            self.resolve()
 
     def resolve(self):
-        while self.apply_gravity():
-            pass
+        self.apply_gravity()
         self.find_matches()
         if self.to_clear:
             self.clearing = True
@@ -135,15 +541,72 @@ class GameState:
                 puyo = self.grid[y][x]
                 puyo.state = "popping"
                 puyo.animation_timer = 0
+                if self.bitboard:
+                    self.bitboard.remove(puyo.color, x, y)  # The masks only hold settled puyos
         else:
             # No more matches, spawn new puyo
-            self.current_puyo = self.next_puyo
-            self.next_puyo = self.next_next_puyo
-            self.next_next_puyo = self.generate_puyo()
-            if not self.is_valid_move(self.current_puyo):
-                self.running = False  # Game over
+            self.spawn_next()
+
+    def resolve_all(self):
+        """
+        Runs gravity, pops and scoring to completion without animation ticks,
+        then spawns the next pair. Returns a ChainLink for every chain step.
+        """
+        trace = []
+        if not self.clearing:
+            self.apply_gravity()
+            self.find_matches()
+        # A pop that is already animating was counted by resolve; finish it first
+        while self.to_clear:
+            if not self.clearing:
+                self.chain_count += 1
+            self.clearing = False
+            score_before = self.score
+            for x, y in self.to_clear:
+                if self.bitboard:
+                    self.bitboard.remove(self.grid[y][x].color, x, y)
+                self.grid[y][x] = EMPTY
+            self.update_score(sum(self.groups_cleared), self.chain_count)
+            trace.append(
+                ChainLink(
+                    self.chain_count,
+                    self.to_clear,
+                    self.colors_cleared,
+                    self.groups_cleared,
+                    self.score - score_before,
+                )
+            )
+            self.apply_gravity()
+            self.find_matches()
+        self.spawn_next()
+        return trace
+
+    def add_nuisance(self, columns):
+        """
+        Drops ``columns[x]`` nuisance puyos onto each column of the settled
+        board at once; puyos that do not fit are lost. Ends the game if the
+        current pair is buried.
+        """
+        for x, count in enumerate(columns):
+            top = self.grid_height - self.heights[x]
+            for y in range(top - 1, max(top - count, 0) - 1, -1):
+                self.grid[y][x] = Puyo(NUISANCE)
+                if self.bitboard:
+                    self.bitboard.add(NUISANCE, x, y)
+            self.heights[x] = min(self.heights[x] + count, self.grid_height)
+        if self.current_puyo and not self.is_valid_move(self.current_puyo):
+            self.running = False
+
+    def spawn_next(self):
+        self.current_puyo = self.preview.popleft()
+        self.preview.append(self.generate_puyo())
+        if not self.is_valid_move(self.current_puyo):
+            self.running = False  # Game over
 
     def find_matches(self):
+        if self.use_bitboard:
+            self.find_matches_bitboard()
+            return
         self.to_clear = []
         self.colors_cleared = set()
         self.groups_cleared = []
@@ -154,12 +617,40 @@ class GameState:
         for y in range(self.grid_height):  # Use self.grid_height
             for x in range(self.grid_width):  # Use self.grid_width
                 puyo = self.grid[y][x]
-                if puyo and not visited[y][x] and puyo.state == "normal":
+                if puyo and not visited[y][x] and puyo.state == "normal" and puyo.color != NUISANCE:
                     connected = self.get_connected_puyos(x, y, visited)
                     if len(connected) >= self.required_group_number:
                         self.to_clear.extend(connected)
                         self.colors_cleared.add(puyo.color)
                         self.groups_cleared.append(len(connected))
+        if self.to_clear:
+            self.to_clear.extend(self.adjacent_nuisance(self.to_clear))
+
+    def adjacent_nuisance(self, cells):
+        """Nuisance puyos next to any of ``cells``, in row-major order."""
+        found = set()
+        for x, y in cells:
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if 0 <= nx < self.grid_width and 0 <= ny < self.grid_height:
+                    neighbor = self.grid[ny][nx]
+                    if neighbor and neighbor.color == NUISANCE and neighbor.state == "normal":
+                        found.add((ny, nx))
+        return [(x, y) for y, x in sorted(found)]
+
+    def find_matches_bitboard(self):
+        board = self.bitboard
+        self.to_clear = []
+        self.colors_cleared = set()
+        self.groups_cleared = []
+        popped = 0
+        for color, group, size in board.find_groups(self.required_group_number):
+            self.to_clear.extend(board.cells(group))
+            self.colors_cleared.add(color)
+            self.groups_cleared.append(size)
+            popped |= group
+        nuisance = board.masks.get(NUISANCE, 0)
+        if popped and nuisance:
+            self.to_clear.extend(board.cells(board.neighbors(popped) & nuisance))
 
     def get_connected_puyos(self, x, y, visited):
         color = self.grid[y][x].color
@@ -196,7 +687,7 @@ class GameState:
                 animation_complete = False
         if animation_complete:
             # Remove the puyos after animation
-            cleared_puyos = len(self.to_clear)
+            cleared_puyos = sum(self.groups_cleared)  # Nuisance puyos score nothing
             for x, y in self.to_clear:
                 self.grid[y][x] = EMPTY
             self.update_score(cleared_puyos, self.chain_count)
@@ -205,52 +696,78 @@ class GameState:
             self.resolve()
 
     def apply_gravity(self):
+        # Compact every column in a single bottom-up pass and refresh its height
         moved = False
-        for y in range(self.grid_height - 2, -1, -1):  # Start from second to last row
-            for x in range(self.grid_width):
-                if self.grid[y][x]:  # Check if there's a puyo at (x, y)
-                    # Ensure we are not accessing out-of-bounds by checking y + 1
-                    if y + 1 < self.grid_height and self.grid[y + 1][x] == EMPTY:
-                        # Move the puyo down
-                        self.grid[y + 1][x] = self.grid[y][x]
-                        self.grid[y][x] = EMPTY
+        grid = self.grid
+        masks = self.bitboard.masks if self.bitboard else None
+        stride = self.grid_width + 1
+        for x in range(self.grid_width):
+            write = self.grid_height - 1
+            for y in range(self.grid_height - 1, -1, -1):
+                puyo = grid[y][x]
+                if puyo:
+                    if y != write:
+                        grid[write][x] = puyo
+                        grid[y][x] = EMPTY
+                        if masks is not None:
+                            # Equal to clearing bit (y, x) and setting bit (write, x)
+                            masks[puyo.color] ^= ((1 << ((write - y) * stride)) | 1) << (y * stride + x)
                         moved = True
+                    write -= 1
+            self.heights[x] = self.grid_height - 1 - write
         return moved
 
+    def rebuild_heights(self):
+        """Recomputes the per-column height index from the top surface of the grid."""
+        self.heights = [0] * self.grid_width
+        for x in range(self.grid_width):
+            for y in range(self.grid_height):
+                if self.grid[y][x]:
+                    self.heights[x] = self.grid_height - y
+                    break
+
+    @property
+    def use_bitboard(self):
+        return self.bitboard is not None
+
+    @use_bitboard.setter
+    def use_bitboard(self, enabled):
+        # The masks are only kept up to date while they are in use
+        if not enabled:
+            self.bitboard = None
+        elif self.bitboard is None:
+            self.bitboard = BitBoard.from_grid(self.grid, self.grid_width, self.grid_height)
+
+    def rebuild_bitboard(self):
+        """
+        Recomputes the per-color bitmasks from the grid, if they are in use. The
+        engine keeps them in step itself; this is only needed after editing
+        ``grid`` directly.
+        """
+        if self.bitboard:
+            self.bitboard = BitBoard.from_grid(self.grid, self.grid_width, self.grid_height)
+
     def update_score(self, cleared_puyos, chain_count):
-        chain_bonus = CHAIN_BONUS[min(chain_count - 1, len(CHAIN_BONUS) - 1)]
-        if self.crazy:
-            chain_bonus = 4 * (2**chain_count)
-        color_bonus = (
-            COLOR_BONUS[min(len(self.colors_cleared) - 1, len(COLOR_BONUS) - 1)]
-            if len(self.colors_cleared) > 0
-            else 0
-        )
-        group_bonus = sum(
-            [
-                GROUP_BONUS[min(size - 4, len(GROUP_BONUS) - 1)]
-                for size in self.groups_cleared
-            ]
+        score_increment = scoring.score_increment(
+            cleared_puyos,
+            chain_count,
+            len(self.colors_cleared),
+            self.groups_cleared,
+            self.crazy,
         )
-        total_bonus = chain_bonus + color_bonus + group_bonus
-        if total_bonus == 0:
-            total_bonus = 1
-        score_increment = cleared_puyos * 10 * total_bonus
         self.score += score_increment
         # Nuisance point calculation
         current_chain_score = self.score  # Or pass in SC if calculated separately
-        TP = 70  # Target points for one nuisance puyo
+        TP = TARGET_POINTS  # Target points for one nuisance puyo
         NP = current_chain_score / TP
         NC = int(NP)  # Rounded down
         NL = NP - NC  # Leftover
 
-        # Get image and text representation for nuisance puyos
-        text_representation = get_puyo_text(NC)
-        image_representation = get_puyo_image(NC)
-        global last_nuisance
-        self.last_nuisance_text = text_representation
-        self.last_nuisance_images = image_representation
+        self.last_nuisance_count = NC
         # Print statement reflecting chain score, cleared puyos, and nuisance details
+        if not self.verbose:
+            return
+        text_representation = self.last_nuisance_text
         if text_representation:
             print(
                 f"Chain {chain_count}: {cleared_puyos} puyos cleared (+{score_increment}) -> Nuisance Puyo: {text_representation} ({NC}) (+{NL:.2f} leftover)"
@@ -0,0 +1,140 @@
+import json
+import marshal
+from time import perf_counter
+
+# GameState methods timed by instrument()
+STAGES = [
+    "resolve",
+    "resolve_all",
+    "apply_gravity",
+    "find_matches",
+    "update_score",
+    "spawn_next",
+]
+
+
+class EngineStats:
+    """
+    Call counts and time per engine stage for one instrumented GameState.
+    ``own`` excludes time spent in nested stages, ``total`` includes it.
+    """
+
+    def __init__(self):
+        self.calls = {stage: 0 for stage in STAGES}
+        self.own = {stage: 0.0 for stage in STAGES}
+        self.total = {stage: 0.0 for stage in STAGES}
+        self.callers = {stage: {} for stage in STAGES}
+        self.gravity_moves = 0  # apply_gravity calls that moved at least one puyo
+        self.cells_on_board = 0  # Puyos on the board, summed over find_matches calls
+        self.chain_lengths = {}  # Chain length -> number of moves that ended with it
+        self.code = {}
+        self.stack = []
+
+    def wrap(self, stage, state):
+        function = getattr(type(state), stage)
+        code = function.__code__
+        # Plain tuples rather than code objects, so EngineStats stay picklable
+        self.code[stage] = (code.co_filename, code.co_firstlineno, code.co_name)
+        return TimedStage(self, state, stage, function)
+
+    def after_apply_gravity(self, state, moved):
+        if moved:
+            self.gravity_moves += 1
+
+    def after_find_matches(self, state, _):
+        # Matching runs on a settled board, so the column heights count its puyos
+        self.cells_on_board += sum(state.heights)
+
+    def after_spawn_next(self, state, _):
+        self.chain_lengths[state.chain_count] = self.chain_lengths.get(state.chain_count, 0) + 1
+
+    def to_dict(self):
+        return {
+            "stages": {
+                stage: {
+                    "calls": self.calls[stage],
+                    "total_time": self.total[stage],
+                    "own_time": self.own[stage],
+                    "mean_time": self.total[stage] / self.calls[stage] if self.calls[stage] else 0,
+                }
+                for stage in STAGES
+            },
+            "gravity_moves": self.gravity_moves,
+            "cells_on_board": self.cells_on_board,
+            "chain_lengths": {str(length): count for length, count in sorted(self.chain_lengths.items())},
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def key(self, stage):
+        return self.code.get(stage, ("~", 0, stage))
+
+    def dump_stats(self, path):
+        """Writes the stage timings in the marshal format read by pstats.Stats."""
+        stats = {}
+        for stage in STAGES:
+            if not self.calls[stage]:
+                continue
+            # Calls from outside any stage are top-level, which pstats shows as no caller
+            callers = {
+                self.key(caller): count for caller, count in self.callers[stage].items() if caller
+            }
+            calls = self.calls[stage]
+            stats[self.key(stage)] = (calls, calls, self.own[stage], self.total[stage], callers)
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+
+
+class TimedStage:
+    """
+    Times one GameState method on an instrumented state. A module-level class
+    rather than a closure, so an instrumented state can still be pickled.
+    """
+
+    def __init__(self, stats, state, stage, function):
+        self.stats = stats
+        self.state = state
+        self.stage = stage
+        self.function = function
+        self.after = getattr(stats, "after_" + stage, None)
+
+    def __call__(self, *args, **kwargs):
+        stats = self.stats
+        stage = self.stage
+        caller = stats.stack[-1][0] if stats.stack else None
+        frame = [stage, 0.0]  # Stage name and time spent in nested stages
+        stats.stack.append(frame)
+        start = perf_counter()
+        try:
+            result = self.function(self.state, *args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            stats.stack.pop()
+            stats.calls[stage] += 1
+            stats.total[stage] += elapsed
+            stats.own[stage] += elapsed - frame[1]
+            if stats.stack:
+                stats.stack[-1][1] += elapsed
+            callers = stats.callers[stage]
+            callers[caller] = callers.get(caller, 0) + 1
+        if self.after:
+            self.after(self.state, result)
+        return result
+
+
+def instrument(state, stats=None):
+    """
+    Starts recording EngineStats for ``state`` and returns them. The timed
+    wrappers are set on the instance, so uninstrumented states pay nothing.
+    """
+    stats = stats if stats is not None else EngineStats()
+    for stage in STAGES:
+        setattr(state, stage, stats.wrap(stage, state))
+    state.stats = stats
+    return stats
+
+def uninstrument(state):
+    """Removes the timed wrappers; the collected EngineStats are kept on the state."""
+    for stage in STAGES:
+        state.__dict__.pop(stage, None)
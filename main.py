@@ -1,12 +1,29 @@
+import argparse
+import random
 import pygame
 from constants import *
 from utils import calculate_tile_size
 from game_state import GameState
 from puyo_game import PuyoGame
+from replay import ReplayReader, ReplayWriter, render
+from sim_thread import SimulationThread, ThreadedPuyoGame
 
 pygame.init()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Play Puyo Puyo.")
+    parser.add_argument("--seed", type=int, help="seed for the pair sequence")
+    parser.add_argument("--record", metavar="PATH", help="write a replay of this game")
+    parser.add_argument("--replay", metavar="PATH", help="watch a recorded replay")
+    parser.add_argument("--threaded", action="store_true", help="simulate on a separate thread")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    if args.replay:
+        render(ReplayReader(args.replay))
+        pygame.quit()
+        return
     if input("Customize? (y/n):").lower()=='y':
         w = int(input(f"Width ({DEFAULT_GRID_WIDTH}):") or DEFAULT_GRID_WIDTH)
         h = int(input(f"Height ({DEFAULT_GRID_HEIGHT}):") or DEFAULT_GRID_HEIGHT)
@@ -14,12 +31,29 @@ def main():
         w, h = DEFAULT_GRID_WIDTH, DEFAULT_GRID_HEIGHT
     size = calculate_tile_size(w, h, BASE_TILE_SIZE, MAX_SCREEN_WIDTH, MAX_SCREEN_HEIGHT)
     sw, sh = size*(w+5), size*(h+6)
-    state = GameState(None, w, h)
-    game = PuyoGame(state, size, sw, sh)
-    while state.running:
-        game.handle_events()
-        game.update()
-        game.draw()
+    seed = args.seed
+    if seed is None and args.record:
+        seed = random.randrange(2**63)  # Replays need a known seed
+    state = GameState(None, w, h, seed=seed)
+    recorder = ReplayWriter.for_state(open(args.record, "wb"), state) if args.record else None
+    if args.threaded:
+        sim = SimulationThread(state, recorder=recorder)
+        game = ThreadedPuyoGame(sim, size, sw, sh)
+        sim.start()
+        while game.state.running:
+            game.handle_events()
+            game.update()
+            game.draw()
+        sim.stop()
+    else:
+        game = PuyoGame(state, size, sw, sh, recorder)
+        while state.running:
+            game.handle_events()
+            game.update()
+            game.draw()
+    if recorder:
+        recorder.close()
+        recorder.f.close()
     pygame.quit()
 
 if __name__=='__main__':
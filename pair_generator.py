@@ -0,0 +1,80 @@
+import random
+from constants import COLORS
+
+class PairGenerator:
+    """
+    Seedable source of (pivot, satellite) color pairs for one game.
+
+    Pairs are drawn from a private random.Random in blocks of ``block_size``
+    so spawning is a tuple lookup, and two games never share RNG state.
+    Between refills the RNG is untouched, so getstate() is O(1) and a
+    restored generator only rebuilds its Random when it needs a new block.
+    """
+
+    def __init__(self, seed=None, colors=COLORS, block_size=64):
+        self.seed = seed
+        self.colors = tuple(colors)
+        self.block_size = block_size
+        self.random = random.Random(seed)
+        self.random_state = self.random.getstate()
+        self.pending = ()  # Pre-drawn pairs
+        self.position = 0  # Index of the next pair in pending
+        self.drawn = 0  # Pairs handed out so far
+
+    def next_pair(self):
+        if self.position >= len(self.pending):
+            self.refill(self.block_size)
+        pair = self.pending[self.position]
+        self.position += 1
+        self.drawn += 1
+        return pair
+
+    def advance(self, count):
+        """
+        Skips ``count`` pairs as if next_pair() had been called that often.
+        Every pair costs the same two draws, so a fresh generator with the same
+        seed advanced by ``drawn`` continues exactly where this one is.
+        """
+        while count:
+            if self.position >= len(self.pending):
+                self.refill(self.block_size)
+            step = min(count, len(self.pending) - self.position)
+            self.position += step
+            self.drawn += step
+            count -= step
+
+    def refill(self, count):
+        """Draws ``count`` more pairs onto the end of the sequence."""
+        if self.random is None:
+            self.random = random.Random()
+            self.random.setstate(self.random_state)
+        colors = self.random.choices(self.colors, k=2 * count)
+        self.pending = self.pending[self.position :] + tuple(zip(colors[0::2], colors[1::2]))
+        self.position = 0
+        self.random_state = self.random.getstate()
+
+    def peek(self, count):
+        """Returns the next ``count`` pairs without consuming them."""
+        missing = count - (len(self.pending) - self.position)
+        if missing > 0:
+            self.refill(max(missing, self.block_size))
+        return list(self.pending[self.position : self.position + count])
+
+    def getstate(self):
+        return (self.seed, self.colors, self.block_size, self.random_state, self.pending, self.position, self.drawn)
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuilds a generator from getstate() without reseeding."""
+        generator = cls.__new__(cls)
+        (
+            generator.seed,
+            generator.colors,
+            generator.block_size,
+            generator.random_state,
+            generator.pending,
+            generator.position,
+            generator.drawn,
+        ) = state
+        generator.random = None  # Restored from random_state on the next refill
+        return generator
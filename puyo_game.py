@@ -1,19 +1,52 @@
 import pygame
 from time import time
 from constants import *
-from assets import nuisance_images
+from assets import nuisance_atlas
+from sprites import cell_sprite, pop_frame
 from game_state import GameState
-from utils import get_puyo_image, get_puyo_text
+from replay import play_input, play_tick
+from utils import get_nuisance_tiers
+
+# Dirty area, as a share of the window, above which draw() repaints everything
+FULL_REDRAW_FRACTION = 0.25
+# Events after which the window contents may be lost and must be repainted
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
+
+def merge_rects(rects):
+    """Unions overlapping rects so no pixel is repainted twice."""
+    merged = []
+    for rect in rects:
+        hits = rect.collidelistall(merged)
+        if hits:
+            rect = rect.copy()
+        while hits:
+            for i in reversed(hits):
+                rect.union_ip(merged.pop(i))
+            hits = rect.collidelistall(merged)
+        merged.append(rect)
+    return merged
 
 class PuyoGame:
-    def __init__(self, state: GameState, tile_size: int, screen_width: int, screen_height: int):
+    def __init__(
+        self,
+        state: GameState,
+        tile_size: int,
+        screen_width: int,
+        screen_height: int,
+        recorder=None,
+        tick_rate=TICK_RATE,
+        uncapped=False,
+    ):
         """
         :param state:         the GameState instance (grid, score, etc.)
         :param tile_size:     size in pixels of one puyo tile
         :param screen_width:  total window width in pixels
         :param screen_height: total window height in pixels
+        :param recorder:      optional replay.ReplayWriter that receives every accepted input
+        :param tick_rate:     simulation ticks per second, whatever the frame rate
+        :param uncapped:      run exactly one tick per update() without waiting (for tests)
         """
-        global lastgrid, SCREEN_WIDTH, SCREEN_HEIGHT
+        global SCREEN_WIDTH, SCREEN_HEIGHT
 
         # Use the externally provided state
         self.state = state
@@ -24,7 +57,10 @@ class PuyoGame:
         # Tile size and screen dimensions
         self.TILE_SIZE = tile_size
         SCREEN_WIDTH, SCREEN_HEIGHT = screen_width, screen_height
-        lastgrid = state.clone().grid
+        self.cell_rects = [
+            [pygame.Rect(x * tile_size, (y + 4) * tile_size, tile_size, tile_size) for x in range(self.grid_width)]
+            for y in range(self.grid_height)
+        ]
 
         # Initialize pygame elements
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -32,120 +68,257 @@ class PuyoGame:
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont("Arial", 24)
 
+        # Rendering assets are only loaded once a window exists
+        self.nuisance_atlas, self.nuisance_rects = nuisance_atlas(tile_size)
+
         # For nuisance display and fast-drop
-        self.nuisance_images = []
+        self.nuisance_icons = []  # Atlas rects of the icons shown, largest first
+        self.nuisance_count = 0
         self.is_down_pressed = False
         self.game_over = False
 
+        # What was drawn last frame: cell signatures, and (rect, signature) per other element
+        self.last_cells = []
+        self.last_overlays = {}
+        self.needs_full_redraw = True
+        self.labels = {}  # HUD label key -> (text, rendered surface)
+
+        # Simulation tick counter, also used to stamp recorded inputs
+        self.tick = 0
+        self.tick_rate = tick_rate
+        self.uncapped = uncapped
+        self.accumulator = 0.0  # Wall-clock seconds not yet simulated
+        self.recorder = recorder
+
     def draw(self):
-        self.screen.fill((0, 0, 0))
+        """
+        Redraws only what changed since the last frame. Grid cells are compared
+        by signature and a changed cell is re-blitted in place; the few other
+        elements (HUD, previews, nuisance tray, game-over text) mark their old
+        and new rects dirty, and those rects are merged and repainted clipped in
+        back-to-front order. Everything is pushed with display.update. When the
+        dirty area passes FULL_REDRAW_FRACTION of the window, one fill and flip
+        is cheaper.
+        """
+        below, cells, above = self.scene()
+        signatures = [signature for _, signature in cells]
+        overlays = {key: (rect, signature) for key, rect, signature, _, _ in below + above}
+        full = self.needs_full_redraw
+        if not full:
+            changed = [i for i, signature in enumerate(self.last_cells) if signature != signatures[i]]
+            dirty = []
+            for key, (rect, signature) in overlays.items():
+                previous = self.last_overlays.get(key)
+                if previous is None:
+                    dirty.append(rect)
+                elif previous[1] != signature:
+                    dirty.append(rect.union(previous[0]))
+            for key, (rect, _) in self.last_overlays.items():
+                if key not in overlays:
+                    dirty.append(rect)
+            tile_area = self.TILE_SIZE * self.TILE_SIZE
+            area = len(changed) * tile_area + sum(rect.width * rect.height for rect in dirty)
+            full = area > FULL_REDRAW_FRACTION * SCREEN_WIDTH * SCREEN_HEIGHT
+        if full:
+            self.screen.set_clip(None)
+            self.screen.fill((0, 0, 0))
+            for _, _, _, paint, args in below:
+                paint(*args)
+            for rect, signature in cells:
+                self.paint_cell(rect, signature)
+            for _, _, _, paint, args in above:
+                paint(*args)
+            pygame.display.flip()
+            self.needs_full_redraw = False
+        elif changed or dirty:
+            # Cell sprites are opaque, so a changed cell is one blit plus whatever lies above it
+            updated = []
+            for i in changed:
+                rect, signature = cells[i]
+                self.paint_cell(rect, signature)
+                for _, above_rect, _, paint, args in above:
+                    if above_rect.colliderect(rect):
+                        self.screen.set_clip(rect)
+                        paint(*args)
+                        self.screen.set_clip(None)
+                updated.append(rect)
+            dirty = merge_rects(dirty)
+            for area in dirty:
+                self.screen.set_clip(area)
+                self.screen.fill((0, 0, 0), area)
+                for _, rect, _, paint, args in below:
+                    if rect.colliderect(area):
+                        paint(*args)
+                for i in self.cells_in(area):
+                    self.paint_cell(*cells[i])
+                for _, rect, _, paint, args in above:
+                    if rect.colliderect(area):
+                        paint(*args)
+            self.screen.set_clip(None)
+            pygame.display.update(updated + dirty)
+        self.last_cells = signatures
+        self.last_overlays = overlays
+
+    def cells_in(self, area):
+        """Row-major indexes of the grid cells that ``area`` touches."""
+        tile = self.TILE_SIZE
+        x0 = max(area.left // tile, 0)
+        x1 = min((area.right - 1) // tile, self.grid_width - 1)
+        y0 = max(area.top // tile - 4, 0)
+        y1 = min((area.bottom - 1) // tile - 4, self.grid_height - 1)
+        return [y * self.grid_width + x for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
 
-        # Score
-        score_text = self.font.render(f"Score: {self.state.score}", True, (255, 255, 255))
-        self.screen.blit(score_text, (10, 10))
+    def scene(self):
+        """
+        Returns the elements drawn below the grid, the grid cells as
+        (rect, signature) in row-major order, and the elements drawn above it.
+        Elements are (key, rect, signature, paint, args), back to front.
+        """
+        below = []
 
-        # Time
+        # Score, time and chain
         elapsed = "gameover" if not self.state.running else int(time() - self.state.start_time)
         ttxt = f"Time: {elapsed}{'s' if elapsed != 'gameover' else ''}"
-        time_text = self.font.render(ttxt, True, (255, 255, 255))
-        self.screen.blit(time_text, (10, 40))
-
-        # Chain
-        chain_text = self.font.render(f"Chain: {self.state.chain_count}", True, (255, 255, 255))
-        self.screen.blit(chain_text, (10, 70))
-
-        # Next puyo
-        for x, y, color in self.state.next_puyo:
-            nx = SCREEN_WIDTH - 180 + x * self.TILE_SIZE
-            ny = 40 + y * self.TILE_SIZE
-            pygame.draw.rect(self.screen, COLOR_MAP[color], (nx, ny, self.TILE_SIZE, self.TILE_SIZE))
-            pygame.draw.rect(self.screen, (255, 255, 255), (nx, ny, self.TILE_SIZE, self.TILE_SIZE), 1)
-
-        # Next-next puyo
-        for x, y, color in self.state.next_next_puyo:
-            nx = SCREEN_WIDTH - 180 + x * self.TILE_SIZE
-            ny = 150 + y * self.TILE_SIZE
-            pygame.draw.rect(self.screen, COLOR_MAP[color], (nx, ny, self.TILE_SIZE, self.TILE_SIZE))
-            pygame.draw.rect(self.screen, (255, 255, 255), (nx, ny, self.TILE_SIZE, self.TILE_SIZE), 1)
+        for key, text, y in (
+            ("score", f"Score: {self.state.score}", 10),
+            ("time", ttxt, 40),
+            ("chain", f"Chain: {self.state.chain_count}", 70),
+        ):
+            surface = self.label(key, text, (255, 255, 255))
+            rect = pygame.Rect((10, y), surface.get_size())
+            below.append((key, rect, text, self.screen.blit, (surface, rect)))
+
+        # Next and next-next puyo
+        for key, pair, top in (("next", self.state.next_puyo, 40), ("next_next", self.state.next_next_puyo, 150)):
+            tiles = [
+                (pygame.Rect(SCREEN_WIDTH - 180 + x * self.TILE_SIZE, top + y * self.TILE_SIZE, self.TILE_SIZE, self.TILE_SIZE), color)
+                for x, y, color in pair
+            ]
+            rect = tiles[0][0].unionall([tile for tile, _ in tiles])
+            below.append((key, rect, tuple((tuple(tile), color) for tile, color in tiles), self.paint_tiles, (tiles,)))
 
         # Nuisance images
-        self.update_nuisance_images(self.state.last_nuisance_images)
-        yoff = 200
-        for img in self.nuisance_images:
-            self.screen.blit(img, (SCREEN_WIDTH - 180, yoff))
-            yoff += img.get_height() + 5
-
-        # Grid & placed puyos
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                rect = (x * self.TILE_SIZE, (y + 4) * self.TILE_SIZE, self.TILE_SIZE, self.TILE_SIZE)
-                pygame.draw.rect(self.screen, (128, 128, 128), rect, 1)
-                cell = self.state.grid[y][x]
-                if cell:
-                    if cell.state == "popping":
-                        # popping animation
-                        progress = cell.animation_timer / POP_TIME
-                        scale = max(1.0 - progress, 0)
-                        alpha = max(255 * (1.0 - progress), 0)
-                        surf = pygame.Surface((self.TILE_SIZE, self.TILE_SIZE), pygame.SRCALPHA)
-                        color = (*COLOR_MAP[cell.color], int(alpha))
-                        inset = self.TILE_SIZE * (1 - scale) / 2
-                        pygame.draw.rect(surf, color,
-                                         (inset, inset, self.TILE_SIZE*scale, self.TILE_SIZE*scale))
-                        self.screen.blit(surf, (x*self.TILE_SIZE, (y+4)*self.TILE_SIZE))
-                    else:
-                        pygame.draw.rect(self.screen, COLOR_MAP[cell.color],
-                                         rect)
-                        pygame.draw.rect(self.screen, (255, 255, 255), rect, 1)
-
-        # Current falling puyo
+        self.update_nuisance_images(self.state.last_nuisance_count)
+        if self.nuisance_icons:
+            rect = pygame.Rect(SCREEN_WIDTH - 180, 200, 0, 0)
+            for icon in self.nuisance_icons:
+                rect.width = max(rect.width, icon.width)
+                rect.height += icon.height + 5
+            below.append(("nuisance", rect, self.nuisance_count, self.paint_nuisance, ()))
+
+        # Grid & placed puyos, with the current falling puyo drawn over its cells
+        falling = {}
         if self.state.current_puyo:
-            for x, y, color in self.state.current_puyo:
-                rect = (x*self.TILE_SIZE, (y+4)*self.TILE_SIZE, self.TILE_SIZE, self.TILE_SIZE)
-                pygame.draw.rect(self.screen, COLOR_MAP[color], rect)
-                pygame.draw.rect(self.screen, (255, 255, 255), rect, 1)
+            falling = {(x, y): color for x, y, color in self.state.current_puyo}
+        cells = []
+        for y, (row, rects) in enumerate(zip(self.state.grid, self.cell_rects)):
+            for x, (cell, rect) in enumerate(zip(row, rects)):
+                if (x, y) in falling:
+                    signature = ("falling", falling[(x, y)])
+                elif cell:
+                    frame = pop_frame(cell.animation_timer) if cell.state == "popping" else 0
+                    signature = (cell.color, cell.state, frame)
+                else:
+                    signature = None
+                cells.append((rect, signature))
 
         # Game over message
+        above = []
         if not self.state.running:
-            go = self.font.render("Game Over! Close window to exit.", True, (255, 0, 0))
-            self.screen.blit(go, ((SCREEN_WIDTH-go.get_width())//2, SCREEN_HEIGHT//2))
+            text = "Game Over! Close window to exit."
+            surface = self.label("game_over", text, (255, 0, 0))
+            width, height = surface.get_size()
+            rect = pygame.Rect((SCREEN_WIDTH - width) // 2, SCREEN_HEIGHT // 2, width, height)
+            above.append(("game_over", rect, text, self.screen.blit, (surface, rect)))
+        return below, cells, above
 
-        pygame.display.flip()
+    def label(self, key, text, color):
+        """Rendered surface for a HUD label; the font only renders when the text changes."""
+        cached = self.labels.get(key)
+        if cached is None or cached[0] != text:
+            cached = self.labels[key] = (text, self.font.render(text, True, color))
+        return cached[1]
 
-    def update(self):
-        delta = self.clock.tick(FPS) / 1000.0
-        if not self.state.clearing:
-            # fast drop if holding down
-            self.state.fall_timer += 5 if self.is_down_pressed else 1
-            if self.state.fall_timer >= self.state.fall_speed:
-                self.state.drop_puyo()
-                self.state.fall_timer = 0
+    def paint_tiles(self, tiles):
+        for rect, color in tiles:
+            # A filled cell sprite covers its grid outline, so it doubles as a preview tile
+            self.screen.blit(cell_sprite(color, self.TILE_SIZE), rect)
+
+    def paint_nuisance(self):
+        yoff = 200
+        for icon in self.nuisance_icons:
+            self.screen.blit(self.nuisance_atlas, (SCREEN_WIDTH - 180, yoff), icon)
+            yoff += icon.height + 5
+
+    def paint_cell(self, rect, signature):
+        if signature is None:
+            sprite = cell_sprite(None, self.TILE_SIZE)
+        elif signature[0] == "falling":
+            sprite = cell_sprite(signature[1], self.TILE_SIZE)
         else:
-            self.state.update_clearing(delta)
+            sprite = cell_sprite(signature[0], self.TILE_SIZE, *signature[1:])
+        self.screen.blit(sprite, rect)
+
+    def update(self):
+        """
+        Runs the simulation ticks that are due since the last frame and returns
+        how many ran. A slow frame is caught up with several ticks (skipping
+        frames) up to MAX_TICKS_PER_FRAME; any time beyond that is dropped.
+        """
+        if self.uncapped:
+            self.clock.tick()
+            self.step()
+            return 1
+        step_time = 1 / self.tick_rate
+        self.accumulator += self.clock.tick(FPS) / 1000.0
+        ticks = 0
+        while self.accumulator >= step_time and ticks < MAX_TICKS_PER_FRAME:
+            self.step()
+            self.accumulator -= step_time
+            ticks += 1
+        if ticks == MAX_TICKS_PER_FRAME:
+            self.accumulator = min(self.accumulator, step_time)
+        return ticks
+
+    def step(self):
+        """Advances the state by one tick, recording a timer drop like any other input."""
+        self.tick += 1
+        play_tick(self.state, self.is_down_pressed, 1 / self.tick_rate, self.recorder, self.tick)
 
     def handle_events(self):
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
-                self.state.running = False
-                self.game_over = True
+                self.quit()
+            elif ev.type in REDRAW_EVENTS:
+                self.needs_full_redraw = True
             elif ev.type == pygame.KEYDOWN and self.state.running:
                 if ev.key == pygame.K_LEFT:
-                    self.state.process_input("left")
+                    self.process_input("left")
                 elif ev.key == pygame.K_RIGHT:
-                    self.state.process_input("right")
+                    self.process_input("right")
                 elif ev.key == pygame.K_DOWN:
                     self.is_down_pressed = True
-                    self.state.process_input("drop")
+                    self.process_input("drop")
                 elif ev.key in (pygame.K_UP, pygame.K_z):
-                    self.state.process_input("rotate_cw")
+                    self.process_input("rotate_cw")
                 elif ev.key == pygame.K_x:
-                    self.state.process_input("rotate_ccw")
+                    self.process_input("rotate_ccw")
             elif ev.type == pygame.KEYUP:
                 if ev.key == pygame.K_DOWN:
                     self.is_down_pressed = False
 
-    def update_nuisance_images(self, nuisance_list):
-        self.nuisance_images = nuisance_list[:4]
+    def process_input(self, action):
+        play_input(self.state, action, self.recorder, self.tick)
+
+    def quit(self):
+        self.state.running = False
+        self.game_over = True
+
+    def update_nuisance_images(self, nuisance_count):
+        if nuisance_count != self.nuisance_count:
+            self.nuisance_count = nuisance_count
+            # The tray draws from the scaled atlas, so it looks up rects rather than images
+            self.nuisance_icons = [self.nuisance_rects[tier] for tier in get_nuisance_tiers(nuisance_count, limit=4)]
 
     def is_running(self):
         return not self.game_over
\ No newline at end of file
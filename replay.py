@@ -0,0 +1,268 @@
+import struct
+from game_state import GameState
+
+# Layout
+#   header:  MAGIC, version, flags, width, height, group size, preview depth, seed
+#   records: one byte (tick delta << 3 | action code) per action; a delta of
+#            DELTA_ESCAPE or more is followed by the full delta as a varint,
+#            and a placement is followed by one byte (column * 4 + orientation)
+#   footer:  index entries (record number, byte offset, tick), entry count,
+#            index offset, INDEX_MAGIC; only present once the writer is closed
+MAGIC = b"PYYO"
+INDEX_MAGIC = b"PYIX"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBBBq")
+INDEX_ENTRY = struct.Struct("<QQQ")
+FOOTER = struct.Struct("<QQ4s")
+FLAG_CRAZY = 1
+
+ACTIONS = ["left", "right", "rotate_cw", "rotate_ccw", "drop", "hard_drop"]
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+PLACE_CODE = 6
+DELTA_ESCAPE = 31
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, offset, end):
+    """Returns (value, next offset), or (None, end) when the varint runs past ``end``."""
+    value = shift = 0
+    while offset < end:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+    return None, end
+
+
+class ReplayWriter:
+    """
+    Streams actions to a binary replay file. Every action is stamped with the
+    tick it happened on; ticks must not decrease. close() appends the seek index.
+    """
+
+    def __init__(
+        self,
+        f,
+        seed,
+        grid_width,
+        grid_height,
+        required_group_number=4,
+        crazy=False,
+        preview_depth=2,
+        index_interval=256,
+    ):
+        if seed is None:
+            raise ValueError("A replay needs a seeded game to be reproducible")
+        self.f = f
+        self.index_interval = index_interval
+        self.index = []
+        self.count = 0
+        self.tick = 0
+        self.offset = HEADER.size
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                FLAG_CRAZY if crazy else 0,
+                grid_width,
+                grid_height,
+                required_group_number,
+                preview_depth,
+                seed,
+            )
+        )
+
+    @classmethod
+    def for_state(cls, f, state, **kwargs):
+        """Starts a replay of a freshly created, seeded GameState."""
+        return cls(
+            f,
+            state.generator.seed,
+            state.grid_width,
+            state.grid_height,
+            state.required_group_number,
+            state.crazy,
+            state.preview_depth,
+            **kwargs,
+        )
+
+    def record(self, tick, action):
+        """Appends an input string or a (column, orientation) placement."""
+        if self.count % self.index_interval == 0:
+            self.index.append((self.count, self.offset, self.tick))
+        delta = tick - self.tick
+        if delta < 0:
+            raise ValueError("Replay ticks must not decrease")
+        out = bytearray()
+        code = PLACE_CODE if isinstance(action, tuple) else ACTION_CODES[action]
+        out.append((min(delta, DELTA_ESCAPE) << 3) | code)
+        if delta >= DELTA_ESCAPE:
+            write_varint(out, delta)
+        if code == PLACE_CODE:
+            column, orientation = action
+            out.append(column * 4 + orientation)
+        self.f.write(out)
+        self.offset += len(out)
+        self.count += 1
+        self.tick = tick
+
+    def close(self):
+        index_offset = self.offset
+        for entry in self.index:
+            self.f.write(INDEX_ENTRY.pack(*entry))
+        self.f.write(FOOTER.pack(len(self.index), index_offset, INDEX_MAGIC))
+        self.f.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayReader:
+    """
+    Decodes a replay from bytes (or a path) through a memoryview. Replays
+    whose writer was never closed have no index and are read to the end; a
+    record cut off by the end of the data is dropped.
+    """
+
+    def __init__(self, data):
+        if isinstance(data, str):
+            with open(data, "rb") as f:
+                data = f.read()
+        self.data = memoryview(data)
+        (
+            magic,
+            version,
+            flags,
+            self.grid_width,
+            self.grid_height,
+            self.required_group_number,
+            self.preview_depth,
+            self.seed,
+        ) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a Py-yo-Py-yo replay")
+        self.crazy = bool(flags & FLAG_CRAZY)
+        self.end = len(self.data)
+        self.index = []
+        if self.end >= HEADER.size + FOOTER.size:
+            count, index_offset, index_magic = FOOTER.unpack_from(self.data, self.end - FOOTER.size)
+            if index_magic == INDEX_MAGIC:
+                self.index = [
+                    INDEX_ENTRY.unpack_from(self.data, index_offset + i * INDEX_ENTRY.size)
+                    for i in range(count)
+                ]
+                self.end = index_offset
+
+    def new_state(self, **kwargs):
+        """Returns the GameState the replay starts from."""
+        return GameState(
+            None,
+            self.grid_width,
+            self.grid_height,
+            required_group_number=self.required_group_number,
+            crazy=self.crazy,
+            seed=self.seed,
+            preview_depth=self.preview_depth,
+            **kwargs,
+        )
+
+    def records(self, start=0):
+        """Yields (record number, tick, action) from record ``start`` onwards."""
+        number, offset, tick = 0, HEADER.size, 0
+        for entry in self.index:
+            if entry[0] > start:
+                break
+            number, offset, tick = entry
+        data, end = self.data, self.end
+        while offset < end:
+            byte = data[offset]
+            offset += 1
+            delta, code = byte >> 3, byte & 7
+            if delta == DELTA_ESCAPE:
+                delta, offset = read_varint(data, offset, end)
+                if delta is None:
+                    return
+            if code == PLACE_CODE:
+                if offset == end:
+                    return
+                action = divmod(data[offset], 4)
+                offset += 1
+            else:
+                action = ACTIONS[code]
+            tick += delta
+            if number >= start:
+                yield number, tick, action
+            number += 1
+
+    def __iter__(self):
+        for _, tick, action in self.records():
+            yield tick, action
+
+
+def play_input(state, action, recorder=None, tick=0):
+    """Applies an input string to ``state``, recording it if the state accepts it."""
+    # Inputs ignored by the state (no pair, or mid-clear) are not recorded
+    if recorder and state.current_puyo and not state.clearing:
+        recorder.record(tick, action)
+    state.process_input(action)
+
+def play_tick(state, fast, delta_time, recorder=None, tick=0):
+    """Runs one GameState.tick, recording a timer drop like any other input."""
+    recordable = recorder and state.current_puyo and not state.clearing
+    if state.tick(fast, delta_time) and recordable:
+        recorder.record(tick, "drop")
+
+def apply_action(state, action):
+    if isinstance(action, tuple):
+        state.place(*action, check=False)
+    else:
+        state.process_input(action)
+
+def play(reader, state=None, until_tick=None):
+    """Re-simulates a replay headless with instant chains; returns the final state."""
+    if state is None:
+        state = reader.new_state(instant=True, verbose=False)
+    for tick, action in reader:
+        if until_tick is not None and tick > until_tick:
+            break
+        apply_action(state, action)
+    return state
+
+def render(reader, tile_size=None):
+    """Plays a replay back in a PuyoGame window at the recorded tick rate."""
+    import pygame
+    from constants import BASE_TILE_SIZE, MAX_SCREEN_WIDTH, MAX_SCREEN_HEIGHT
+    from utils import calculate_tile_size
+    from puyo_game import PuyoGame
+
+    class ReplayGame(PuyoGame):
+        def step(self):
+            # Inputs stamped with tick t were handled before simulation tick t + 1
+            while self.pending is not None and self.pending[0] <= self.tick:
+                apply_action(state, self.pending[1])
+                self.pending = next(records, None)
+            super().step()
+
+    w, h = reader.grid_width, reader.grid_height
+    size = tile_size or calculate_tile_size(w, h, BASE_TILE_SIZE, MAX_SCREEN_WIDTH, MAX_SCREEN_HEIGHT)
+    state = reader.new_state(instant=True, verbose=False)
+    state.fall_speed = float("inf")  # Every drop is in the replay
+    game = ReplayGame(state, size, size * (w + 5), size * (h + 6))
+    records = iter(reader)
+    game.pending = next(records, None)
+    while game.pending is not None and not game.game_over:
+        for ev in pygame.event.get():
+            if ev.type == pygame.QUIT:
+                game.game_over = True
+        game.update()
+        game.draw()
+    return state
@@ -0,0 +1,26 @@
+from constants import CHAIN_BONUS, COLOR_BONUS, GROUP_BONUS
+
+def chain_bonus(chain_count, crazy=False):
+    if crazy:
+        return 4 * (2**chain_count)
+    return CHAIN_BONUS[min(chain_count - 1, len(CHAIN_BONUS) - 1)]
+
+def color_bonus(color_count):
+    if color_count > 0:
+        return COLOR_BONUS[min(color_count - 1, len(COLOR_BONUS) - 1)]
+    return 0
+
+def group_bonus(size):
+    # Groups smaller than 4 index from the end of the table, as they always have
+    return GROUP_BONUS[min(size - 4, len(GROUP_BONUS) - 1)]
+
+def score_increment(cleared_puyos, chain_count, color_count, group_sizes, crazy=False):
+    """Returns the points scored by one chain link."""
+    total_bonus = (
+        chain_bonus(chain_count, crazy)
+        + color_bonus(color_count)
+        + sum(group_bonus(size) for size in group_sizes)
+    )
+    if total_bonus == 0:
+        total_bonus = 1
+    return cleared_puyos * 10 * total_bonus
@@ -0,0 +1,93 @@
+import random
+from time import perf_counter
+import cli
+from game_state import GameState
+from bot import SearchBot
+
+POLICIES = ["random", "greedy", "search"]
+
+def random_policy(rng):
+    def choose(state):
+        placements = state.legal_placements()
+        return rng.choice(placements) if placements else None
+    return choose
+
+def make_policy(name, seed, budget):
+    if name == "random":
+        return random_policy(random.Random(seed))
+    if name == "greedy":
+        # One ply with no time limit: immediate reward plus the static evaluation
+        return SearchBot(time_budget=float("inf"), max_depth=1).choose
+    return SearchBot(time_budget=budget).choose
+
+def play_game(job):
+    """Plays one headless game and returns its summary."""
+    seed, options = job
+    state = GameState(
+        None,
+        options["width"],
+        options["height"],
+        required_group_number=options["group"],
+        crazy=options["crazy"],
+        use_bitboard=True,
+        instant=True,
+        verbose=False,
+        seed=seed,
+    )
+    choose = make_policy(options["policy"], seed, options["budget"])
+    moves = 0
+    max_chain = 0
+    while state.running and moves < options["max_moves"]:
+        placement = choose(state)
+        if placement is None:
+            break
+        state.place(*placement, check=False)
+        moves += 1
+        max_chain = max(max_chain, len(state.chain_trace))
+    return {
+        "seed": seed,
+        "score": state.score,
+        "max_chain": max_chain,
+        "moves": moves,
+        "game_over": not state.running,
+    }
+
+def summarize(results, elapsed, options):
+    count = len(results)
+    moves = sum(result["moves"] for result in results)
+    scores = [result["score"] for result in results]
+    return cli.summarize(
+        results,
+        elapsed,
+        options,
+        "games",
+        games_per_sec=count / elapsed if elapsed else 0,
+        moves_per_sec=moves / elapsed if elapsed else 0,
+        score={
+            "mean": sum(scores) / count if count else 0,
+            "min": min(scores, default=0),
+            "max": max(scores, default=0),
+        },
+        max_chain=max((result["max_chain"] for result in results), default=0),
+        mean_game_length=moves / count if count else 0,
+    )
+
+def parse_args(argv=None):
+    parser = cli.game_parser("Play headless Puyo Puyo games in parallel.", max_moves=1000)
+    parser.add_argument("-n", "--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="game i is seeded with seed + i")
+    parser.add_argument("--policy", choices=POLICIES, default="greedy")
+    parser.add_argument("-o", "--output", help="JSON file to write (default: stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = cli.game_options(args, policy=args.policy)
+    jobs = [(args.seed + i, options) for i in range(args.games)]
+    start = perf_counter()
+    results = cli.run_jobs(play_game, jobs, args.workers)
+    summary = summarize(results, perf_counter() - start, dict(options, workers=args.workers, seed=args.seed))
+    cli.write_json(summary, args.output)
+
+if __name__ == "__main__":
+    main()
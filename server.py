@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import json
+from constants import *
+from versus import VersusMatch
+
+# One character per cell in the board rows sent to clients
+CELL_CHARS = {EMPTY: ".", "red": "r", "green": "g", "blue": "b", "yellow": "y", NUISANCE: "n"}
+INPUTS = {"left", "right", "rotate_cw", "rotate_ccw", "drop", "hard_drop"}
+MAX_WRITE_BUFFER = 1 << 16  # Connections further behind than this skip state updates
+
+
+def encode_board(state):
+    return ["".join(CELL_CHARS[puyo and puyo.color] for puyo in row) for row in state.grid]
+
+def encode_player(player, board):
+    state = player.state
+    return {
+        "board": board,
+        "current": state.current_puyo,
+        "next": [[color for _, _, color in pair] for pair in state.preview],
+        "score": state.score,
+        "chain": len(state.chain_trace),
+        "pending": player.pending,
+        "running": state.running,
+    }
+
+
+class StreamConnection:
+    """A client on a TCP stream; messages are JSON objects, one per line."""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def send_line(self, line, droppable=False):
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            if not droppable:
+                # A client this far behind is not reading; handle_stream sees the
+                # closed stream and disconnects it, which forfeits a seated player
+                self.writer.close()
+            return
+        self.writer.write(line)
+
+    def send(self, message):
+        self.send_line(json.dumps(message).encode() + b"\n")
+
+
+class LocalClient:
+    """In-process stand-in for a TCP client, for tests and offline tools."""
+
+    def __init__(self, server):
+        self.server = server
+        self.inbox = asyncio.Queue()
+
+    def send_line(self, line, droppable=False):
+        self.inbox.put_nowait(json.loads(line))
+
+    def send(self, message):
+        self.inbox.put_nowait(message)
+
+    def request(self, **message):
+        """Sends a message to the server as if it came over the wire."""
+        self.server.handle(self, message)
+
+    async def recv(self):
+        return await self.inbox.get()
+
+    def close(self):
+        self.server.disconnect(self)
+
+
+class Room:
+    """
+    One VersusMatch plus the connections watching it. The match starts once
+    both seats are taken; from then on the server ticks it until a board tops out.
+    """
+
+    def __init__(self, name, seed=None, **rules):
+        self.name = name
+        self.rules = rules
+        self.seats = [None, None]
+        self.spectators = set()
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """Sets up a fresh match, e.g. for a rematch once a finished room fills again."""
+        self.match = VersusMatch(seed, **self.rules)
+        self.started = False
+        self.finished = False
+        self.dirty = False  # Changed since the last broadcast
+        self.tick = 0
+        # Encoded boards; they only change when a pair locks
+        self.boards = [encode_board(player.state) for player in self.match.players]
+
+    @property
+    def connections(self):
+        return [conn for conn in self.seats if conn is not None] + list(self.spectators)
+
+    def apply(self, index, message):
+        """Runs one player input; raises ValueError for anything the rules reject."""
+        state = self.match.players[index].state
+        before = state.current_puyo
+        if message["op"] == "place":
+            state.place(int(message["column"]), int(message["orientation"]))
+        elif message.get("action") in INPUTS:
+            state.process_input(message["action"])
+        else:
+            raise ValueError(f"Unknown input {message.get('action')!r}")
+        self.after_move(index, before)
+
+    def after_move(self, index, before):
+        state = self.match.players[index].state
+        if state.current_puyo is not before:  # The pair locked and a new one spawned
+            self.match.settle(index)
+            self.boards[index] = encode_board(state)
+        self.dirty = True
+
+    def step(self):
+        self.tick += 1
+        for index, player in enumerate(self.match.players):
+            before = player.state.current_puyo
+            if player.state.tick():
+                self.after_move(index, before)
+        if not self.match.running:
+            self.finished = True
+            self.dirty = True
+
+    def broadcast(self):
+        message = {
+            "op": "state",
+            "room": self.name,
+            "tick": self.tick,
+            "players": [encode_player(player, board) for player, board in zip(self.match.players, self.boards)],
+            "winner": self.match.winner if self.finished else None,
+        }
+        line = json.dumps(message).encode() + b"\n"
+        # Every update is a full snapshot, so a connection that skips some
+        # catches up with the next one
+        for conn in self.connections:
+            conn.send_line(line, droppable=True)
+        self.dirty = False
+
+
+class Server:
+    """
+    Hosts any number of rooms in one process. Every running room is ticked by
+    a single scheduler task at ``tick_rate``; waiting and finished rooms cost
+    nothing. Changed rooms are encoded once per tick and sent to every member.
+
+    Client messages:
+        {"op": "join", "room": name, "role": "player" | "spectator"}
+        {"op": "input", "action": "left" | "right" | "rotate_cw" | ...}
+        {"op": "place", "column": x, "orientation": o}
+        {"op": "leave"}
+    """
+
+    def __init__(self, tick_rate=TICK_RATE, **rules):
+        self.tick_rate = tick_rate
+        self.rules = rules
+        self.rooms = {}
+        self.active = set()  # Started rooms that have not finished
+        self.members = {}  # Connection -> (room, seat index or None)
+        self.changed = set()  # Rooms touched by a message since the last tick
+
+    def handle(self, conn, message):
+        try:
+            op = message.get("op")
+            if op == "join":
+                self.join(conn, str(message["room"]), message.get("role", "player"), message.get("seed"))
+            elif op in ("input", "place"):
+                room, index = self.members.get(conn, (None, None))
+                if index is None:
+                    raise ValueError("Only seated players can send inputs")
+                if not room.started or room.finished:
+                    raise ValueError("The match is not running")
+                room.apply(index, message)
+                self.changed.add(room)
+            elif op == "leave":
+                self.disconnect(conn)
+            else:
+                raise ValueError(f"Unknown op {op!r}")
+        except (KeyError, TypeError, ValueError) as error:
+            conn.send({"op": "error", "message": str(error)})
+
+    def join(self, conn, name, role, seed=None):
+        if conn in self.members:
+            raise ValueError("Already in a room")
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = Room(name, seed, **self.rules)
+        if role == "spectator":
+            room.spectators.add(conn)
+            self.members[conn] = (room, None)
+            conn.send({"op": "joined", "room": name, "seat": None})
+            self.changed.add(room)
+            return
+        if None not in room.seats:
+            raise ValueError(f"Room {name!r} is full")
+        index = room.seats.index(None)
+        room.seats[index] = conn
+        self.members[conn] = (room, index)
+        conn.send({"op": "joined", "room": name, "seat": index})
+        if None not in room.seats and (not room.started or room.finished):
+            if room.finished:
+                room.reset(seed)
+            room.started = True
+            self.active.add(room)
+        self.changed.add(room)
+
+    def disconnect(self, conn):
+        room, index = self.members.pop(conn, (None, None))
+        if room is None:
+            return
+        if index is None:
+            room.spectators.discard(conn)
+        else:
+            room.seats[index] = None
+            if room.started and not room.finished:
+                room.match.players[index].state.running = False  # Leaving forfeits
+                room.finished = True
+                room.broadcast()
+                self.active.discard(room)
+        if not room.connections:
+            del self.rooms[room.name]
+            self.active.discard(room)
+            self.changed.discard(room)
+
+    def tick_rooms(self):
+        changed = self.changed
+        self.changed = set()
+        for room in list(self.active):
+            room.step()
+            if room.dirty:
+                changed.add(room)
+            if room.finished:
+                self.active.discard(room)
+        for room in changed:
+            room.broadcast()
+
+    async def run(self):
+        """The shared scheduler: ticks every running room at a fixed rate."""
+        loop = asyncio.get_running_loop()
+        step_time = 1 / self.tick_rate
+        deadline = loop.time()
+        while True:
+            self.tick_rooms()
+            deadline += step_time
+            delay = deadline - loop.time()
+            if delay < -MAX_TICKS_PER_FRAME * step_time:
+                deadline = loop.time()  # Too far behind; drop the backlog
+            await asyncio.sleep(max(delay, 0))
+
+    async def handle_stream(self, reader, writer):
+        conn = StreamConnection(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    conn.send({"op": "error", "message": "Messages must be JSON objects, one per line"})
+                    continue
+                if isinstance(message, dict):
+                    self.handle(conn, message)
+                else:
+                    conn.send({"op": "error", "message": "Messages must be JSON objects, one per line"})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.disconnect(conn)
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=7070):
+        server = await asyncio.start_server(self.handle_stream, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Host Puyo Puyo versus rooms over TCP (JSON lines).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7070)
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE)
+    parser.add_argument("--width", type=int, default=DEFAULT_GRID_WIDTH)
+    parser.add_argument("--height", type=int, default=DEFAULT_GRID_HEIGHT)
+    parser.add_argument("--group", type=int, default=4, help="puyos needed to pop a group")
+    parser.add_argument("--crazy", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = Server(
+        args.tick_rate,
+        grid_width=args.width,
+        grid_height=args.height,
+        required_group_number=args.group,
+        crazy=args.crazy,
+    )
+    asyncio.run(server.serve(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
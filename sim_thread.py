@@ -0,0 +1,148 @@
+import queue
+import threading
+from collections import namedtuple
+from time import perf_counter
+from constants import FPS, MAX_TICKS_PER_FRAME, TICK_RATE
+from puyo_game import PuyoGame
+from replay import play_input, play_tick
+
+# Immutable render-side copy of a Puyo
+CellView = namedtuple("CellView", ["color", "state", "animation_timer"])
+
+# Everything PuyoGame draws, copied out of the GameState after a tick
+FrameView = namedtuple(
+    "FrameView",
+    [
+        "tick",
+        "grid_width",
+        "grid_height",
+        "required_group_number",
+        "grid",
+        "current_puyo",
+        "next_puyo",
+        "next_next_puyo",
+        "score",
+        "chain_count",
+        "last_nuisance_count",
+        "clearing",
+        "running",
+        "start_time",
+    ],
+)
+
+def frame_view(state, tick):
+    return FrameView(
+        tick,
+        state.grid_width,
+        state.grid_height,
+        state.required_group_number,
+        tuple(
+            tuple(puyo and CellView(puyo.color, puyo.state, puyo.animation_timer) for puyo in row)
+            for row in state.grid
+        ),
+        state.current_puyo and tuple(tuple(puyo) for puyo in state.current_puyo),
+        tuple(tuple(puyo) for puyo in state.next_puyo),
+        tuple(tuple(puyo) for puyo in state.next_next_puyo),
+        state.score,
+        state.chain_count,
+        state.last_nuisance_count,
+        state.clearing,
+        state.running,
+        state.start_time,
+    )
+
+
+class SimulationThread(threading.Thread):
+    """
+    Owns a GameState and advances it at ``tick_rate`` on its own thread.
+    Inputs arrive through a SimpleQueue; after every tick a new FrameView is
+    built and swapped into ``front``, so the renderer always reads a complete,
+    never-mutated frame while the next one is being built. An exception that
+    stops the thread is kept in ``error`` and raised again by frame().
+    """
+
+    def __init__(self, state, tick_rate=TICK_RATE, recorder=None):
+        super().__init__(daemon=True)
+        self.state = state
+        self.tick_rate = tick_rate
+        self.recorder = recorder
+        self.inputs = queue.SimpleQueue()
+        self.stopped = threading.Event()
+        self.fast = False
+        self.tick = 0
+        self.front = frame_view(state, 0)
+        self.error = None
+
+    def send(self, action):
+        """Queues an input string, or ("fast", bool) for the held down key."""
+        self.inputs.put(action)
+
+    def frame(self):
+        """Returns the latest FrameView, or raises the error that stopped the simulation."""
+        if self.error is not None:
+            raise self.error
+        return self.front
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        try:
+            self.simulate()
+        except Exception as error:
+            self.error = error
+
+    def simulate(self):
+        step_time = 1 / self.tick_rate
+        deadline = perf_counter()
+        while not self.stopped.is_set() and self.state.running:
+            self.apply_inputs()
+            self.tick += 1
+            play_tick(self.state, self.fast, step_time, self.recorder, self.tick)
+            self.front = frame_view(self.state, self.tick)
+            deadline += step_time
+            delay = deadline - perf_counter()
+            if delay > 0:
+                self.stopped.wait(delay)
+            elif delay < -MAX_TICKS_PER_FRAME * step_time:
+                deadline = perf_counter()  # Too far behind; drop the backlog
+
+    def apply_inputs(self):
+        while True:
+            try:
+                action = self.inputs.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(action, tuple):
+                self.fast = action[1]
+                continue
+            play_input(self.state, action, self.recorder, self.tick)
+
+
+class ThreadedPuyoGame(PuyoGame):
+    """PuyoGame that only renders; the simulation runs on a SimulationThread."""
+
+    def __init__(self, sim, tile_size, screen_width, screen_height):
+        super().__init__(sim.front, tile_size, screen_width, screen_height, tick_rate=sim.tick_rate)
+        self.sim = sim
+        self.fast = False  # Last held-down state sent to the simulation
+
+    def update(self):
+        self.clock.tick(FPS)
+        if self.is_down_pressed != self.fast:
+            self.fast = self.is_down_pressed
+            self.sim.send(("fast", self.fast))
+        self.state = self.sim.frame()
+        self.tick = self.state.tick
+        return 0
+
+    def process_input(self, action):
+        self.sim.send(action)
+
+    def quit(self):
+        self.sim.stop()
+        self.sim.state.running = False
+        self.state = frame_view(self.sim.state, self.sim.tick)
+        self.game_over = True
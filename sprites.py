@@ -0,0 +1,42 @@
+from constants import COLOR_MAP, POP_FRAMES, POP_TIME
+
+# (color, tile size, state, frame) -> Surface, filled on first use
+sprites = {}
+
+def pop_frame(animation_timer):
+    """Index of the pre-rendered pop frame for a puyo that has been popping this long."""
+    return min(int(animation_timer / POP_TIME * POP_FRAMES), POP_FRAMES - 1)
+
+def cell_sprite(color, tile_size, state="normal", frame=0):
+    """
+    Returns the opaque tile for one grid cell, grid outline included, so a cell
+    is drawn with a single blit. ``color`` None is an empty cell.
+    """
+    key = (color, tile_size, state, frame)
+    sprite = sprites.get(key)
+    if sprite is None:
+        sprite = sprites[key] = render_cell(color, tile_size, state, frame)
+    return sprite
+
+def render_cell(color, tile_size, state, frame):
+    import pygame
+
+    sprite = pygame.Surface((tile_size, tile_size))
+    rect = sprite.get_rect()
+    pygame.draw.rect(sprite, (128, 128, 128), rect, 1)
+    if color is None:
+        pass
+    elif state == "popping":
+        progress = frame / POP_FRAMES
+        scale = 1.0 - progress
+        surf = pygame.Surface((tile_size, tile_size), pygame.SRCALPHA)
+        inset = tile_size * (1 - scale) / 2
+        pygame.draw.rect(surf, (*COLOR_MAP[color], int(255 * scale)),
+                         (inset, inset, tile_size * scale, tile_size * scale))
+        sprite.blit(surf, (0, 0))
+    else:
+        pygame.draw.rect(sprite, COLOR_MAP[color], rect)
+        pygame.draw.rect(sprite, (255, 255, 255), rect, 1)
+    if pygame.display.get_surface() is not None:
+        sprite = sprite.convert()
+    return sprite
@@ -0,0 +1,68 @@
+"""BatchEngine checked board by board against GameState. Run with pytest."""
+import random
+import numpy as np
+from batch_engine import BatchEngine
+from constants import COLORS, ROTATION_OFFSETS
+from game_state import GameState
+from puyo import Puyo
+
+RULES = [(6, 12, 4, False), (4, 8, 3, True), (8, 14, 2, False), (5, 10, 4, True)]
+
+def grid_codes(state):
+    return np.array([[COLORS.index(puyo.color) + 1 if puyo else 0 for puyo in row] for row in state.grid])
+
+def test_step_matches_game_state(num_boards=32, steps=60):
+    """Random placements give the same boards, scores and game overs on both engines."""
+    for width, height, group, crazy in RULES:
+        engine = BatchEngine(num_boards, width, height, group, crazy, seed=1)
+        states = [
+            GameState(None, width, height, required_group_number=group, crazy=crazy, instant=True, verbose=False)
+            for _ in range(num_boards)
+        ]
+        rng = np.random.default_rng(5)
+        for _ in range(steps):
+            columns = rng.integers(0, width, num_boards)
+            orientations = rng.integers(0, len(ROTATION_OFFSETS), num_boards)
+            legal = engine.legal_mask()
+            pairs = engine.pairs[:, 0].copy()
+            was_running = engine.running.copy()
+            score_delta, _ = engine.step(columns, orientations)
+            for i, state in enumerate(states):
+                if not was_running[i]:
+                    continue
+                column, orientation = int(columns[i]), int(orientations[i])
+                if not legal[i, column, orientation]:
+                    assert not engine.running[i]
+                    state.running = False
+                    continue
+                # Drop the batch engine's pair from the same top rows it uses
+                dx, dy = ROTATION_OFFSETS[orientation]
+                pivot, satellite = (COLORS[code - 1] for code in pairs[i])
+                state.current_puyo = [[column, int(dy == -1), pivot], [column + dx, int(dy == 1), satellite]]
+                score_before = state.score
+                state.hard_drop()
+                assert score_delta[i] == state.score - score_before
+                assert (grid_codes(state) == engine.grids[i]).all()
+                assert state.running == engine.running[i]
+
+def test_legal_mask_matches_legal_placements(num_boards=300):
+    """Reachability agrees with GameState on boards with full and nearly full columns."""
+    rng = random.Random(3)
+    for width, height, _, _ in RULES:
+        engine = BatchEngine(num_boards, width, height, seed=0)
+        engine.grids[:] = 0
+        for i in range(num_boards):
+            for x in range(width):
+                column_height = rng.choice([0, height, height - 1, height - 2, rng.randrange(height + 1)])
+                if x == engine.spawn_column:
+                    column_height = min(column_height, height - 2)  # Keep the game running
+                for k in range(column_height):
+                    engine.grids[i, height - 1 - k, x] = 1 + (x + k) % len(COLORS)
+        legal = engine.legal_mask()
+        for i in range(num_boards):
+            state = GameState(None, width, height, instant=True, verbose=False, seed=1)
+            state.grid = [[Puyo(COLORS[code - 1]) if code else None for code in row] for row in engine.grids[i]]
+            state.rebuild_heights()
+            state.rebuild_bitboard()
+            state.current_puyo = state.generate_puyo()
+            assert {(int(x), int(o)) for x, o in zip(*np.nonzero(legal[i]))} == set(state.legal_placements())
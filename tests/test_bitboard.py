@@ -0,0 +1,60 @@
+"""The bitboard matcher checked against the BFS matcher. Run with pytest."""
+import random
+from bitboard import BitBoard
+from constants import COLORS, NUISANCE
+from game_state import GameState
+from puyo import Puyo
+
+def matches(state):
+    # Groups come in the same order; the cells within a group may not
+    return sorted(state.to_clear), state.groups_cleared, state.colors_cleared
+
+def random_grid(rng, width, height):
+    """Settled columns of colors and nuisance, dense enough to form many groups."""
+    colors = rng.sample(COLORS, rng.randint(1, len(COLORS))) + [NUISANCE] * rng.randint(0, 2)
+    grid = [[None] * width for _ in range(height)]
+    for x in range(width):
+        for y in range(height - rng.randint(0, height), height):
+            grid[y][x] = Puyo(rng.choice(colors))
+    return grid
+
+def test_find_matches_bitboard_matches_bfs(boards=2000):
+    rng = random.Random(2)
+    for _ in range(boards):
+        width, height = rng.randint(1, 9), rng.randint(1, 14)
+        grid = random_grid(rng, width, height)
+        bfs = GameState(grid, width, height, required_group_number=rng.randint(2, 5), verbose=False, seed=1)
+        bitboard = bfs.clone()
+        bitboard.use_bitboard = True
+        bfs.find_matches()
+        bitboard.find_matches()
+        assert matches(bitboard) == matches(bfs)
+
+def test_masks_follow_games_with_nuisance(games=30):
+    """Both matchers play the same game, and the masks always equal a rebuild from the grid."""
+    rng = random.Random(4)
+    for seed in range(games):
+        states = [
+            GameState(None, 6, 12, required_group_number=3, use_bitboard=use, verbose=False, seed=seed)
+            for use in (False, True)
+        ]
+        for _ in range(200):
+            if not states[0].running:
+                break
+            if states[0].clearing:
+                delta_time = rng.choice([0.05, 0.3])
+                for state in states:
+                    state.update_clearing(delta_time)
+            elif rng.random() < 0.1:
+                columns = [rng.randint(0, 3) for _ in range(6)]
+                for state in states:
+                    state.add_nuisance(columns)
+            else:
+                action = rng.choice(["left", "right", "rotate_cw", "hard_drop"])
+                for state in states:
+                    state.process_input(action)
+            bfs, bitboard = states
+            assert bitboard.snapshot()[:2] == bfs.snapshot()[:2]
+            assert matches(bitboard) == matches(bfs)
+            rebuilt = BitBoard.from_grid(bitboard.grid, 6, 12).masks
+            assert {color: mask for color, mask in bitboard.bitboard.masks.items() if mask} == rebuilt
@@ -0,0 +1,31 @@
+"""PuyoEnv and VectorPuyoEnv agree on observations and illegal placements. Run with pytest."""
+import numpy as np
+from env import PuyoEnv, VectorPuyoEnv, encode_action
+
+def test_observations_share_one_layout():
+    for preview_depth in (2, 4):
+        single = PuyoEnv(preview_depth=preview_depth).reset(seed=1)
+        batch = VectorPuyoEnv(3, preview_depth=preview_depth).reset(seed=1)
+        assert single.keys() == batch.keys()
+        for key, value in single.items():
+            assert batch[key].shape == (3,) + value.shape
+            assert batch[key].dtype == value.dtype
+        # Both pairs wait at the spawn point
+        assert (batch["piece"][:, :, :2] == single["piece"][:, :2]).all()
+        assert (batch["piece"][:, :, 2] == batch["pairs"][:, 0]).all()
+
+def test_unreachable_placements_end_the_game_on_both_envs():
+    single = PuyoEnv()
+    single.reset(seed=1)
+    # The satellite would sit right of the last column
+    illegal = encode_action(single.grid_width - 1, 3)
+    assert illegal not in single.legal_actions()
+    _, reward, done, info = single.step(illegal)
+    assert (reward, done, info["placed"]) == (0, True, False)
+
+    batch = VectorPuyoEnv(2)
+    batch.reset(seed=1)
+    legal = int(np.flatnonzero(batch.action_mask()[1])[0])
+    _, rewards, dones, _ = batch.step([illegal, legal])
+    assert rewards.tolist() == [0, 0]
+    assert dones.tolist() == [True, False]
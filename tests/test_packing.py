@@ -0,0 +1,63 @@
+"""GameState.to_bytes / from_bytes and the delta encoding must round-trip exactly."""
+import random
+from game_state import GameState, apply_delta, encode_delta
+
+def fields(state):
+    return (
+        [[puyo and puyo.color for puyo in row] for row in state.grid],
+        state.current_puyo,
+        [list(pair) for pair in state.preview],
+        state.score,
+        state.chain_count,
+        state.running,
+        state.crazy,
+        state.required_group_number,
+        state.preview_depth,
+        state.grid_width,
+        state.grid_height,
+    )
+
+def test_pack_round_trip():
+    rng = random.Random(0)
+    for seed in range(20):
+        state = GameState(
+            None,
+            rng.randint(3, 8),
+            rng.randint(6, 14),
+            seed=seed,
+            instant=True,
+            verbose=False,
+            preview_depth=rng.choice([2, 3, 5]),
+            crazy=seed % 2 == 0,
+            required_group_number=3,
+        )
+        previous = state.to_bytes()
+        for move in range(60):
+            placements = state.legal_placements()
+            if not state.running or not placements:
+                break
+            state.place(*rng.choice(placements))
+            if move == 20 and seed % 3 == 0:
+                state.add_nuisance([1] * state.grid_width)
+            packed = state.to_bytes()
+            assert apply_delta(previous, encode_delta(previous, packed)) == packed
+            previous = packed
+
+            restored = GameState.from_bytes(packed, instant=True, verbose=False)
+            assert fields(restored) == fields(state)
+            assert restored.to_bytes() == packed
+            # A restored seeded game keeps dealing the same pairs
+            original = state.clone()
+            for _ in range(5):
+                placements = original.legal_placements()
+                if not original.running or not placements:
+                    break
+                original.place(*placements[0])
+                restored.place(*placements[0])
+            assert fields(restored) == fields(original)
+
+def test_delta_size_change_falls_back_to_full_copy():
+    small = GameState(None, 6, 12, seed=1, verbose=False).to_bytes()
+    large = GameState(None, 8, 14, seed=1, verbose=False).to_bytes()
+    assert apply_delta(small, encode_delta(small, large)) == large
+    assert apply_delta(small, encode_delta(small, small)) == small
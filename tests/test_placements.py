@@ -0,0 +1,57 @@
+"""legal_placements and place checked against a brute-force search over real inputs."""
+import random
+from collections import deque
+from constants import COLORS
+from game_state import ROTATION_INDEX, GameState
+from puyo import Puyo
+
+def random_state(rng, width, height):
+    """A settled board with random column heights, some of them full."""
+    state = GameState(None, width, height, instant=True, verbose=False, seed=rng.randrange(1000))
+    spawn = (width - 1) // 2
+    for x in range(width):
+        column_height = rng.choice([0, height, height - 1, height - 2, rng.randrange(height + 1)])
+        if x == spawn:
+            column_height = min(column_height, height - 2)
+        for y in range(height - column_height, height):
+            state.grid[y][x] = Puyo(COLORS[(x * 3 + y) % len(COLORS)])  # Never four in a group
+    state.rebuild_heights()
+    state.rebuild_bitboard()
+    return state
+
+def reachable_by_inputs(state):
+    """
+    Every pair position process_input can reach before the pair locks, mapped
+    to a state holding it there.
+    """
+    start = state.clone()
+    found = {}
+    queue = deque([start])
+    seen = {str(start.current_puyo)}
+    while queue:
+        current = queue.popleft()
+        (px, py, _), (sx, sy, _) = current.current_puyo
+        found.setdefault((px, ROTATION_INDEX[(sx - px, sy - py)]), current)
+        for action in ("left", "right", "rotate_cw", "rotate_ccw", "drop"):
+            if action == "drop" and not current.is_valid_move(current.current_puyo, dy=1):
+                continue  # Would lock the pair
+            moved = current.clone()
+            moved.process_input(action)
+            key = str(moved.current_puyo)
+            if key not in seen:
+                seen.add(key)
+                queue.append(moved)
+    return found
+
+def test_legal_placements_match_inputs(boards=150):
+    rng = random.Random(8)
+    for _ in range(boards):
+        state = random_state(rng, rng.randint(3, 8), rng.randint(4, 12))
+        found = reachable_by_inputs(state)
+        assert state.legal_placements() == sorted(found)
+        # place() lands exactly where hard dropping from the reached position does
+        for placement, reached in found.items():
+            placed = state.clone()
+            placed.place(*placement)
+            reached.process_input("hard_drop")
+            assert placed.snapshot().board == reached.snapshot().board
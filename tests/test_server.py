@@ -0,0 +1,110 @@
+"""Server rooms driven through LocalClient. Run with pytest."""
+import server as server_module
+from server import LocalClient, Server, StreamConnection
+
+def drain(client):
+    """Every message waiting in a client's inbox."""
+    messages = []
+    while not client.inbox.empty():
+        messages.append(client.inbox.get_nowait())
+    return messages
+
+def last_state(client):
+    states = [message for message in drain(client) if message["op"] == "state"]
+    return states[-1] if states else None
+
+def seated_room(seed=1):
+    server = Server()
+    players = [LocalClient(server), LocalClient(server)]
+    for player in players:
+        player.request(op="join", room="lobby", seed=seed)
+    return server, players
+
+def test_join_assigns_seats_and_starts_the_match():
+    server = Server()
+    first, second, third, watcher = (LocalClient(server) for _ in range(4))
+    first.request(op="join", room="lobby")
+    assert drain(first) == [{"op": "joined", "room": "lobby", "seat": 0}]
+    assert not server.rooms["lobby"].started
+    second.request(op="join", room="lobby")
+    assert drain(second) == [{"op": "joined", "room": "lobby", "seat": 1}]
+    assert server.rooms["lobby"] in server.active
+    third.request(op="join", room="lobby")
+    assert drain(third)[0]["op"] == "error"
+    watcher.request(op="join", room="lobby", role="spectator")
+    assert drain(watcher) == [{"op": "joined", "room": "lobby", "seat": None}]
+
+def test_inputs_move_the_pair_and_are_broadcast_to_everyone():
+    server, (first, second) = seated_room()
+    watcher = LocalClient(server)
+    watcher.request(op="join", room="lobby", role="spectator")
+    server.tick_rooms()
+    for client in (first, second, watcher):
+        drain(client)
+    spawn = server.rooms["lobby"].match.players[0].state.current_puyo[0][0]
+    first.request(op="input", action="left")
+    server.tick_rooms()
+    states = [last_state(client) for client in (first, second, watcher)]
+    assert states[0] == states[1] == states[2]
+    assert states[0]["players"][0]["current"][0][0] == spawn - 1
+    assert states[0]["players"][1]["current"][0][0] == spawn
+
+def test_rejected_inputs_report_an_error():
+    server, (first, second) = seated_room()
+    drain(first)
+    first.request(op="input", action="teleport")
+    first.request(op="place", column=99, orientation=0)
+    errors = drain(first)
+    assert [message["op"] for message in errors] == ["error", "error"]
+    watcher = LocalClient(server)
+    watcher.request(op="join", room="lobby", role="spectator")
+    watcher.request(op="input", action="left")
+    assert drain(watcher)[-1]["op"] == "error"
+
+def test_leaving_forfeits_and_a_full_room_starts_a_rematch():
+    server, (first, second) = seated_room()
+    room = server.rooms["lobby"]
+    server.tick_rooms()
+    drain(second)
+    first.close()
+    state = last_state(second)
+    assert state["winner"] == 1
+    assert room.finished and room not in server.active
+    old_match = room.match
+    newcomer = LocalClient(server)
+    newcomer.request(op="join", room="lobby", seed=2)
+    assert drain(newcomer)[0] == {"op": "joined", "room": "lobby", "seat": 0}
+    assert room.match is not old_match
+    assert room.started and not room.finished and room in server.active
+    second.close()
+    newcomer.close()
+    assert "lobby" not in server.rooms
+
+class FakeTransport:
+    def __init__(self, size):
+        self.size = size
+
+    def get_write_buffer_size(self):
+        return self.size
+
+class FakeWriter:
+    def __init__(self, size):
+        self.transport = FakeTransport(size)
+        self.written = []
+        self.closed = False
+
+    def write(self, data):
+        self.written.append(data)
+
+    def close(self):
+        self.closed = True
+
+def test_backed_up_connections_skip_updates_and_close_on_other_messages():
+    behind = StreamConnection(FakeWriter(server_module.MAX_WRITE_BUFFER + 1))
+    behind.send_line(b"{}\n", droppable=True)
+    assert behind.writer.written == [] and not behind.writer.closed
+    behind.send({"op": "error", "message": "x"})
+    assert behind.writer.written == [] and behind.writer.closed
+    current = StreamConnection(FakeWriter(0))
+    current.send_line(b"{}\n", droppable=True)
+    assert current.writer.written == [b"{}\n"]
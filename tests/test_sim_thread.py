@@ -0,0 +1,34 @@
+"""SimulationThread error handling. Run with pytest."""
+import pytest
+from game_state import GameState
+from sim_thread import SimulationThread
+
+def test_frame_raises_error_that_stopped_simulation():
+    state = GameState(None, 6, 12, verbose=False, seed=1)
+
+    def tick(fast, delta_time):
+        raise RuntimeError("broken tick")
+
+    state.tick = tick
+    sim = SimulationThread(state)
+    sim.start()
+    sim.join(timeout=5)
+    assert not sim.is_alive()
+    with pytest.raises(RuntimeError, match="broken tick"):
+        sim.frame()
+
+def test_inputs_are_applied_and_recorded():
+    class Recorder:
+        def __init__(self):
+            self.records = []
+
+        def record(self, tick, action):
+            self.records.append((tick, action))
+
+    state = GameState(None, 6, 12, verbose=False, seed=1)
+    recorder = Recorder()
+    sim = SimulationThread(state, recorder=recorder)
+    sim.send("left")
+    sim.apply_inputs()
+    assert recorder.records == [(0, "left")]
+    assert state.current_puyo[0][0] == (state.grid_width - 1) // 2 - 1
@@ -0,0 +1,71 @@
+"""Versus garbage rules: nuisance clearing, offsetting, the score carry and the drop cap. Run with pytest."""
+from constants import NUISANCE, TARGET_POINTS
+from puyo import Puyo
+from versus import MAX_NUISANCE_DROP, VersusMatch
+
+def set_board(state, columns, pair=("red", "red")):
+    """Stacks ``columns[x]`` (bottom first) on each column and recolors the current pair."""
+    for x, column in enumerate(columns):
+        for k, color in enumerate(column):
+            state.grid[state.grid_height - 1 - k][x] = Puyo(color)
+    state.rebuild_heights()
+    state.rebuild_bitboard()
+    state.current_puyo = [[x, y, color] for (x, y, _), color in zip(state.current_puyo, pair)]
+
+def nuisance_count(state):
+    return sum(puyo is not None and puyo.color == NUISANCE for row in state.grid for puyo in row)
+
+def test_nuisance_clears_next_to_popped_groups():
+    for use_bitboard in (False, True):
+        match = VersusMatch(seed=1, use_bitboard=use_bitboard)
+        state = match.players[0].state
+        # Two reds and the red pair pop in column 0, next to the four lowest
+        # nuisance puyos of column 1; the fifth and the one in column 2 stay
+        set_board(state, [["red", "red"], [NUISANCE] * 5, [NUISANCE]])
+        match.play(0, 0, 0)
+        assert [link.group_sizes for link in state.chain_trace] == [[4]]
+        assert len(state.chain_trace[0].cells) == 8
+        assert nuisance_count(state) == 2
+        assert state.heights[:3] == [0, 1, 1]
+
+def test_outgoing_nuisance_offsets_pending_garbage_first():
+    match = VersusMatch(seed=1)
+    player, opponent = match.players
+    set_board(player.state, [["red", "red"]])
+    player.pending = 10
+    player.leftover = TARGET_POINTS - 1
+    sent = match.play(0, 0, 0)
+    assert player.state.score == 40
+    # 40 points plus the carried 69 make one nuisance puyo, which cancels one pending
+    assert (sent, player.pending, opponent.pending, player.sent) == (0, 9, 0, 0)
+
+def test_leftover_score_carries_to_the_next_chain():
+    match = VersusMatch(seed=1)
+    player, opponent = match.players
+    set_board(player.state, [["red", "red"], [], ["blue", "blue"]], pair=("red", "red"))
+    assert match.play(0, 0, 0) == 0
+    assert player.leftover == 40
+    player.state.current_puyo = [[x, y, "blue"] for x, y, _ in player.state.current_puyo]
+    assert match.play(0, 2, 0) == 1
+    assert (player.leftover, opponent.pending, player.sent) == (80 - TARGET_POINTS, 1, 1)
+
+def test_pending_garbage_drops_at_most_the_cap():
+    match = VersusMatch(seed=1, grid_height=14)
+    player = match.players[0]
+    player.pending = MAX_NUISANCE_DROP + 12
+    set_board(player.state, [], pair=("red", "blue"))
+    match.play(0, 0, 0)
+    assert player.received == MAX_NUISANCE_DROP
+    assert player.pending == 12
+    assert nuisance_count(player.state) == MAX_NUISANCE_DROP
+    # Whole rows first: every column takes the same share of the cap
+    assert player.state.heights[1:] == [MAX_NUISANCE_DROP // player.state.grid_width] * 5
+
+def test_chaining_move_holds_pending_garbage_back():
+    match = VersusMatch(seed=1)
+    player = match.players[0]
+    set_board(player.state, [["red", "red"]])
+    player.pending = 50
+    match.play(0, 0, 0)
+    assert player.received == 0
+    assert nuisance_count(player.state) == 0
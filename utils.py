@@ -1,5 +1,5 @@
+from functools import lru_cache
 from constants import PUYO_TEXT, MIN_TILE_SIZE
-from assets import nuisance_images
 
 def ceildiv(a, b):
     """Returns the ceiling division of a by b."""
@@ -10,18 +10,46 @@ def calculate_tile_size(grid_w, grid_h, base_size, max_w, max_h, margin_w=5, mar
     max_tile_h = max_h // (grid_h + margin_h)
     return max(min(max_tile_w, max_tile_h, base_size), MIN_TILE_SIZE)
 
-def get_puyo_image(nuisance_count):
-    images = []
-    for value, img in sorted(nuisance_images.items(), reverse=True):
-        while nuisance_count >= value:
-            images.append(img)
-            nuisance_count -= value
-    return images
+# Nuisance tiers, largest first
+NUISANCE_TIERS = tuple(sorted(PUYO_TEXT, reverse=True))
 
+@lru_cache(maxsize=256)
+def decompose_nuisance(nuisance_count):
+    """Splits a nuisance count into ((tier, count), ...) pairs, largest tier first."""
+    parts = []
+    for tier in NUISANCE_TIERS:
+        count, nuisance_count = divmod(nuisance_count, tier)
+        if count:
+            parts.append((tier, count))
+    return tuple(parts)
+
+@lru_cache(maxsize=256)
+def get_nuisance_tiers(nuisance_count, limit=None):
+    """
+    The tier of every nuisance icon for a count, largest first, as a tuple;
+    ``limit`` caps how many are listed.
+    """
+    tiers = []
+    for tier, count in decompose_nuisance(nuisance_count):
+        if limit is not None:
+            count = min(count, limit - len(tiers))
+        tiers.extend([tier] * count)
+        if limit is not None and len(tiers) >= limit:
+            break
+    return tuple(tiers)
+
+@lru_cache(maxsize=64)
+def get_puyo_image(nuisance_count, limit=None):
+    """
+    Nuisance icons for a count as a tuple, largest first; ``limit`` caps how
+    many are built. The result is cached and shared, so it is immutable.
+    """
+    # Imported here so headless users of utils never load pygame or the PNGs
+    from assets import load_nuisance_images
+
+    images = load_nuisance_images()
+    return tuple(images[tier] for tier in get_nuisance_tiers(nuisance_count, limit))
+
+@lru_cache(maxsize=256)
 def get_puyo_text(nuisance_count):
-    text = ""
-    for value, char in sorted(PUYO_TEXT.items(), reverse=True):
-        while nuisance_count >= value:
-            text += char
-            nuisance_count -= value
-    return text
\ No newline at end of file
+    return "".join(PUYO_TEXT[tier] * count for tier, count in decompose_nuisance(nuisance_count))
@@ -0,0 +1,183 @@
+import random
+from time import perf_counter
+import cli
+from constants import DEFAULT_GRID_WIDTH, DEFAULT_GRID_HEIGHT, TARGET_POINTS
+from game_state import GameState
+from selfplay import POLICIES, make_policy
+
+MAX_NUISANCE_DROP = 30  # Most nuisance puyos that fall on a board at once
+
+
+class Player:
+    """One side of a match: its board plus the garbage it owes and is owed."""
+
+    def __init__(self, state):
+        self.state = state
+        self.pending = 0  # Incoming nuisance puyos not yet dropped
+        self.leftover = 0  # Score not yet worth a whole nuisance puyo
+        self.sent = 0
+        self.received = 0
+        self.moves = 0
+
+
+class VersusMatch:
+    """
+    Two headless boards fed the same pair sequence. Players move in turns;
+    each move's chain score becomes nuisance puyos (TARGET_POINTS each, the
+    remainder carried to the next chain). Outgoing nuisance first offsets the
+    player's own pending garbage; the rest is queued for the opponent, who
+    receives up to MAX_NUISANCE_DROP at once after a move that did not chain.
+    """
+
+    def __init__(
+        self,
+        seed=None,
+        grid_width=DEFAULT_GRID_WIDTH,
+        grid_height=DEFAULT_GRID_HEIGHT,
+        required_group_number=4,
+        crazy=False,
+        preview_depth=2,
+        use_bitboard=True,
+    ):
+        if seed is None:
+            seed = random.randrange(2**63)
+        self.seed = seed
+        self.random = random.Random(seed)  # Picks the columns of partial nuisance rows
+        self.players = [
+            Player(
+                GameState(
+                    None,
+                    grid_width,
+                    grid_height,
+                    required_group_number=required_group_number,
+                    crazy=crazy,
+                    use_bitboard=use_bitboard,
+                    instant=True,
+                    verbose=False,
+                    seed=seed,
+                    preview_depth=preview_depth,
+                )
+            )
+            for _ in range(2)
+        ]
+
+    @property
+    def running(self):
+        return all(player.state.running for player in self.players)
+
+    @property
+    def winner(self):
+        """Index of the player still standing, or None while both are (or neither is)."""
+        alive = [i for i, player in enumerate(self.players) if player.state.running]
+        return alive[0] if len(alive) == 1 else None
+
+    def play(self, index, column, orientation):
+        """Places player ``index``'s pair and settles the garbage; returns the nuisance sent."""
+        self.players[index].state.place(column, orientation, check=False)
+        return self.settle(index)
+
+    def settle(self, index):
+        """Exchanges garbage once player ``index``'s pair has locked and resolved."""
+        player = self.players[index]
+        opponent = self.players[1 - index]
+        state = player.state
+        player.moves += 1
+        gained = sum(link.score for link in state.chain_trace)
+        count, player.leftover = divmod(gained + player.leftover, TARGET_POINTS)
+        offset = min(count, player.pending)
+        player.pending -= offset
+        count -= offset
+        opponent.pending += count
+        player.sent += count
+        if not state.chain_trace and player.pending and state.running:
+            self.drop_nuisance(player)
+        return count
+
+    def drop_nuisance(self, player):
+        """Drops up to MAX_NUISANCE_DROP pending puyos: whole rows, then random columns."""
+        width = player.state.grid_width
+        count = min(player.pending, MAX_NUISANCE_DROP)
+        rows, extra = divmod(count, width)
+        columns = [rows] * width
+        for x in self.random.sample(range(width), extra):
+            columns[x] += 1
+        player.state.add_nuisance(columns)
+        player.pending -= count
+        player.received += count
+
+
+def play_match(job):
+    """Plays one headless match between two policies and returns its summary."""
+    seed, options = job
+    match = VersusMatch(
+        seed,
+        options["width"],
+        options["height"],
+        required_group_number=options["group"],
+        crazy=options["crazy"],
+    )
+    policies = [
+        make_policy(name, seed * 2 + i, options["budget"]) for i, name in enumerate(options["policies"])
+    ]
+    turns = 0
+    while match.running and turns < options["max_moves"]:
+        for index, choose in enumerate(policies):
+            state = match.players[index].state
+            placement = choose(state)
+            if placement is None:
+                state.running = False
+                break
+            match.play(index, *placement)
+            if not match.running:
+                break
+        turns += 1
+    return {
+        "seed": seed,
+        "winner": match.winner,
+        "turns": turns,
+        "players": [
+            {
+                "score": player.state.score,
+                "sent": player.sent,
+                "received": player.received,
+                "moves": player.moves,
+            }
+            for player in match.players
+        ],
+    }
+
+def summarize(results, elapsed, options):
+    count = len(results)
+    wins = [sum(result["winner"] == i for result in results) for i in range(2)]
+    return cli.summarize(
+        results,
+        elapsed,
+        options,
+        "matches",
+        matches_per_hour=count / elapsed * 3600 if elapsed else 0,
+        wins=wins,
+        draws=count - sum(wins),
+        mean_turns=sum(result["turns"] for result in results) / count if count else 0,
+    )
+
+def parse_args(argv=None):
+    parser = cli.game_parser(
+        "Play headless versus matches in parallel.", max_moves=500, max_moves_help="turns before a match is a draw"
+    )
+    parser.add_argument("-n", "--matches", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="match i is seeded with seed + i")
+    parser.add_argument("--policies", nargs=2, choices=POLICIES, default=["greedy", "greedy"])
+    parser.add_argument("-o", "--output", help="JSON file to write (default: stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = cli.game_options(args, policies=args.policies)
+    jobs = [(args.seed + i, options) for i in range(args.matches)]
+    start = perf_counter()
+    results = cli.run_jobs(play_match, jobs, args.workers)
+    summary = summarize(results, perf_counter() - start, dict(options, workers=args.workers, seed=args.seed))
+    cli.write_json(summary, args.output)
+
+if __name__ == "__main__":
+    main()